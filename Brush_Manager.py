@@ -21,15 +21,26 @@ import os
 import sys
 import subprocess
 import json
+from collections import OrderedDict
+from operator import attrgetter
+from types import MappingProxyType
 import bpy.utils.previews
 from bpy.app.handlers import persistent
 from bpy.types import Operator, Menu, Panel, PropertyGroup, AddonPreferences, Scene, WindowManager, BlendData
 from bpy.props import *
 import rna_keymap_ui
 from bl_ui import space_toolsystem_common, space_toolsystem_toolbar
-from .t3dn_bip import previews
-from .t3dn_bip.ops import InstallPillow
+from .t3dn_bip import previews, settings as bip_settings, processes as bip_processes
+from .t3dn_bip import convert as bip_convert, atlas as bip_atlas
+from .t3dn_bip.ops import InstallPillow, PurgeCache
 from .t3dn_bip.utils import support_pillow
+from .library_index import get_library_index, brush_info, save_library_indexes
+from .blend_reader import read_brushes, BlendFileError
+from .library_scanner import scanner
+from .preview_store import PreviewStore
+from .brush_index import BrushIndex, INDEXED_PROPERTIES
+from .enum_items import update_enum_items, rename_enum_item
+from .brush_search import BrushSearch, RecentBrushes, brush_metadata
 
 
 Addon_Name = __package__
@@ -151,6 +162,7 @@ def evaluate_brush_tools(brushes, mode=''):
 
 
 def update_pref_def_brush(self, context, mode=''):
+    clear_pref_default_brushes()
     if context.mode not in self.modes.in_modes:
         return None
     if not mode:
@@ -191,7 +203,180 @@ def update_pref_def_gv_brush(self, context):
     update_pref_def_brush(self, context, mode='VERTEX_GPENCIL')
 
 
+MODE_PREFIXES = MappingProxyType({
+    'SCULPT': 's',
+    'PAINT_TEXTURE': 'ip',
+    'PAINT_WEIGHT': 'wp',
+    'PAINT_VERTEX': 'vp',
+    'PAINT_GPENCIL': 'gp',
+    'VERTEX_GPENCIL': 'gv'
+})
+
+# Preference names which only differ by the mode prefix
+PREF_PROPS = (
+    'pref_brush', 'pref_tool', 'pref_other_tool', 'use_startup_favorites',
+    'path_to_startup_favorites', 'brush_library', 'wide_popup_layout',
+    'wide_popup_layout_size', 'popup_max_tool_columns', 'popup_width',
+    'preview_frame_scale', 'popup_items_scale', 'show_def_brushes_in_categories',
+)
+
+
+def mode_pref_props(m):
+    return {
+        'pref_brush': 'default_' + m + '_brush_',
+        'pref_tool': m + '_tool_brush_',
+        'pref_other_tool': m + '_tool_',
+        'use_startup_favorites': 'use_' + m + '_startup_favorites',
+        'path_to_startup_favorites': 'path_to_' + m + '_startup_favorites',
+        'brush_library': m + '_brush_library',
+        'wide_popup_layout': 'wide_' + m + '_popup_layout',
+        'wide_popup_layout_size': 'wide_' + m + '_popup_layout_size',
+        'popup_max_tool_columns': 'popup_' + m + '_max_tool_columns',
+        'popup_width': 'popup_' + m + '_width',
+        'preview_frame_scale': 'preview_' + m + '_frame_scale',
+        'popup_items_scale': 'popup_' + m + '_items_scale',
+        'show_def_brushes_in_categories': 'show_' + m + '_def_brushes_in_categories',
+    }
+
+
+class ModeDescriptor:
+    """Settings of one paint mode with the getters of its mode specific properties.
+    """
+    __slots__ = (
+        'name', 'prefix', 'props', 'get_tool_settings', 'get_brush_tool',
+        'get_brush_use_mode', 'get_fav_settings', 'get_fav_store', 'pref_getters',
+    )
+
+    def __init__(self, name, props):
+        self.name = name
+        self.prefix = MODE_PREFIXES[name]
+        props.update(mode_pref_props(self.prefix))
+        self.props = MappingProxyType(props)
+        self.get_tool_settings = attrgetter(props['tool_settings'])
+        self.get_brush_tool = attrgetter(props['brush_tool'])
+        self.get_brush_use_mode = attrgetter(props['brush_use_mode'])
+        self.get_fav_settings = attrgetter(props['fav_settings'])
+        self.get_fav_store = attrgetter(props['fav_store'])
+        # pref_brush, pref_tool and pref_other_tool are name prefixes, not properties
+        self.pref_getters = MappingProxyType({
+            key: attrgetter(props[key]) for key in PREF_PROPS[3:]})
+
+
+def build_mode_registry():
+    """Build the descriptors of the modes once, BM_Modes only looks them up
+    """
+    global MODE_REGISTRY, MODE_TABLE
+    registry = dict(
+        SCULPT={
+            'tool_settings': 'sculpt',  # context.tool_settings
+            'brush_tool': 'sculpt_tool',
+            'brush_use_mode': 'use_paint_sculpt',
+            'fav_settings': 'bm_favorite_list_settings',
+            'fav_store': 'bm_sculpt_fav_list_store',
+            'icons_folder': 'icon_themes',
+            'has_themes': True,
+            'def_brushes_tool_list': BRUSHES_SCULPT,
+            'other_tools_list': TOOLS_SCULPT,
+            'def_brush_names': BRUSHES_SCULPT_NAMES,
+            'is_split_tools': False,
+            'use_custom_icons': True,
+            'default_custom_icons': 'default_brushes_custom_icon',
+        },
+        PAINT_TEXTURE={
+            'tool_settings': 'image_paint',
+            'brush_tool': 'image_tool',
+            'brush_use_mode': 'use_paint_image',
+            'fav_settings': 'bm_paint_favorite_settings',
+            'fav_store': 'bm_paint_fav_list_store',
+            'icons_folder': 'paint_icons',
+            'has_themes': False,
+            'def_brushes_tool_list': BRUSHES_IPAINT,
+            'other_tools_list': TOOLS_IPAINT,
+            'def_brush_names': BRUSHES_IPAINT_NAMES,
+            'is_split_tools': False,
+            'use_custom_icons': False,
+            'default_custom_icons': False,
+        },
+        PAINT_GPENCIL={
+            'tool_settings': 'gpencil_paint',
+            'brush_tool': 'gpencil_tool',
+            'brush_use_mode': 'use_paint_grease_pencil',
+            'fav_settings': 'bm_gpaint_favorite_settings',
+            'fav_store': 'bm_gpaint_fav_list_store',
+            'icons_folder': 'gpaint_icons',
+            'has_themes': False,
+            'def_brushes_tool_list': BRUSHES_GPAINT,
+            'other_tools_list': TOOLS_GPAINT,
+            'def_brush_names': BRUSHES_GPAINT_NAMES,
+            'is_split_tools': True,  # if brush tool has more default brushes than one
+            'use_custom_icons': False,
+            'default_custom_icons': False,
+        },
+        PAINT_WEIGHT={
+            'tool_settings': 'weight_paint',
+            'brush_tool': 'weight_tool',
+            'brush_use_mode': 'use_paint_weight',
+            'fav_settings': 'bm_wpaint_favorite_settings',
+            'fav_store': 'bm_wpaint_fav_list_store',
+            'icons_folder': 'wpaint_icons',
+            'has_themes': False,
+            'def_brushes_tool_list': BRUSHES_WPAINT,
+            'other_tools_list': TOOLS_WPAINT,
+            'def_brush_names': BRUSHES_WPAINT_NAMES,
+            'is_split_tools': True,
+            'use_custom_icons': True,
+            'default_custom_icons': 'default_wp_brushes_custom_icon',
+        },
+        PAINT_VERTEX={
+            'tool_settings': 'vertex_paint',
+            'brush_tool': 'vertex_tool',
+            'brush_use_mode': 'use_paint_vertex',
+            'fav_settings': 'bm_vpaint_favorite_settings',
+            'fav_store': 'bm_vpaint_fav_list_store',
+            'icons_folder': 'vpaint_icons',
+            'has_themes': False,
+            'def_brushes_tool_list': BRUSHES_VPAINT,
+            'other_tools_list': TOOLS_VPAINT,
+            'def_brush_names': BRUSHES_VPAINT_NAMES,
+            'is_split_tools': True,
+            'use_custom_icons': True,
+            'default_custom_icons': 'default_vp_brushes_custom_icon',
+        },
+        VERTEX_GPENCIL={
+            'tool_settings': 'gpencil_vertex_paint',
+            'brush_tool': 'gpencil_vertex_tool',
+            'brush_use_mode': 'use_vertex_grease_pencil',
+            'fav_settings': 'bm_gvertex_favorite_settings',
+            'fav_store': 'bm_gvertex_fav_list_store',
+            'icons_folder': 'vpaint_icons',
+            'has_themes': False,
+            'def_brushes_tool_list': BRUSHES_GVERTEX,
+            'other_tools_list': TOOLS_GVERTEX,
+            'def_brush_names': BRUSHES_GVERTEX_NAMES,
+            'is_split_tools': False,
+            'use_custom_icons': True,
+            'default_custom_icons': 'default_gv_brushes_custom_icon',
+        },
+    )
+    MODE_REGISTRY = MappingProxyType({
+        mode: ModeDescriptor(mode, props) for mode, props in registry.items()})
+    MODE_TABLE = MappingProxyType({
+        mode: descriptor.props for mode, descriptor in MODE_REGISTRY.items()})
+    return MODE_REGISTRY
+
+
+# The preferences define their properties from it, so it is built on import
+MODE_REGISTRY = MODE_TABLE = None
+build_mode_registry()
+
+
 class BM_Modes:
+    """Mode specific settings of the add-on, for the current mode or the given one
+
+    The settings live in MODE_REGISTRY, so an instance only keeps the mode.
+    """
+    __slots__ = ('mode',)
+
     in_modes = [
         'SCULPT',
         'PAINT_TEXTURE',
@@ -200,6 +385,7 @@ class BM_Modes:
         'PAINT_GPENCIL',
         'VERTEX_GPENCIL',
     ]
+    mode_prefixes = MODE_PREFIXES
 
     def __init__(self, context_mode=''):
         if MODE:
@@ -210,222 +396,99 @@ class BM_Modes:
             self.mode = 'PAINT_TEXTURE'
         if context_mode != '':
             self.mode = context_mode
-        self.mode_prefixes = {
-            'SCULPT': 's',
-            'PAINT_TEXTURE': 'ip',
-            'PAINT_WEIGHT': 'wp',
-            'PAINT_VERTEX': 'vp',
-            'PAINT_GPENCIL': 'gp',
-            'VERTEX_GPENCIL': 'gv'
-        }
-        self.Modes = dict(
-            SCULPT={
-                'tool_settings': 'sculpt',  # context.tool_settings
-                'brush_tool': 'sculpt_tool',
-                'brush_use_mode': 'use_paint_sculpt',
-                'fav_settings': 'bm_favorite_list_settings',
-                'fav_store': 'bm_sculpt_fav_list_store',
-                'icons_folder': 'icon_themes',
-                'has_themes': True,
-                'def_brushes_tool_list': BRUSHES_SCULPT,
-                'other_tools_list': TOOLS_SCULPT,
-                'def_brush_names': BRUSHES_SCULPT_NAMES,
-                'is_split_tools': False,
-                'use_custom_icons': True,
-                'default_custom_icons': 'default_brushes_custom_icon',
-            },
-            PAINT_TEXTURE={
-                'tool_settings': 'image_paint',
-                'brush_tool': 'image_tool',
-                'brush_use_mode': 'use_paint_image',
-                'fav_settings': 'bm_paint_favorite_settings',
-                'fav_store': 'bm_paint_fav_list_store',
-                'icons_folder': 'paint_icons',
-                'has_themes': False,
-                'def_brushes_tool_list': BRUSHES_IPAINT,
-                'other_tools_list': TOOLS_IPAINT,
-                'def_brush_names': BRUSHES_IPAINT_NAMES,
-                'is_split_tools': False,
-                'use_custom_icons': False,
-                'default_custom_icons': False,
-            },
-            PAINT_GPENCIL={
-                'tool_settings': 'gpencil_paint',
-                'brush_tool': 'gpencil_tool',
-                'brush_use_mode': 'use_paint_grease_pencil',
-                'fav_settings': 'bm_gpaint_favorite_settings',
-                'fav_store': 'bm_gpaint_fav_list_store',
-                'icons_folder': 'gpaint_icons',
-                'has_themes': False,
-                'def_brushes_tool_list': BRUSHES_GPAINT,
-                'other_tools_list': TOOLS_GPAINT,
-                'def_brush_names': BRUSHES_GPAINT_NAMES,
-                'is_split_tools': True,  # if brush tool has more default brushes than one
-                'use_custom_icons': False,
-                'default_custom_icons': False,
-            },
-            PAINT_WEIGHT={
-                'tool_settings': 'weight_paint',
-                'brush_tool': 'weight_tool',
-                'brush_use_mode': 'use_paint_weight',
-                'fav_settings': 'bm_wpaint_favorite_settings',
-                'fav_store': 'bm_wpaint_fav_list_store',
-                'icons_folder': 'wpaint_icons',
-                'has_themes': False,
-                'def_brushes_tool_list': BRUSHES_WPAINT,
-                'other_tools_list': TOOLS_WPAINT,
-                'def_brush_names': BRUSHES_WPAINT_NAMES,
-                'is_split_tools': True,
-                'use_custom_icons': True,
-                'default_custom_icons': 'default_wp_brushes_custom_icon',
-            },
-            PAINT_VERTEX={
-                'tool_settings': 'vertex_paint',
-                'brush_tool': 'vertex_tool',
-                'brush_use_mode': 'use_paint_vertex',
-                'fav_settings': 'bm_vpaint_favorite_settings',
-                'fav_store': 'bm_vpaint_fav_list_store',
-                'icons_folder': 'vpaint_icons',
-                'has_themes': False,
-                'def_brushes_tool_list': BRUSHES_VPAINT,
-                'other_tools_list': TOOLS_VPAINT,
-                'def_brush_names': BRUSHES_VPAINT_NAMES,
-                'is_split_tools': True,
-                'use_custom_icons': True,
-                'default_custom_icons': 'default_vp_brushes_custom_icon',
-            },
-            VERTEX_GPENCIL={
-                'tool_settings': 'gpencil_vertex_paint',
-                'brush_tool': 'gpencil_vertex_tool',
-                'brush_use_mode': 'use_vertex_grease_pencil',
-                'fav_settings': 'bm_gvertex_favorite_settings',
-                'fav_store': 'bm_gvertex_fav_list_store',
-                'icons_folder': 'vpaint_icons',
-                'has_themes': False,
-                'def_brushes_tool_list': BRUSHES_GVERTEX,
-                'other_tools_list': TOOLS_GVERTEX,
-                'def_brush_names': BRUSHES_GVERTEX_NAMES,
-                'is_split_tools': False,
-                'use_custom_icons': True,
-                'default_custom_icons': 'default_gv_brushes_custom_icon',
-            },
-        )
-        for im in self.in_modes:
-            m = self.mode_prefixes.get(im)
-            similar_props = {
-                'pref_brush': 'default_' + m + '_brush_',
-                'pref_tool': m + '_tool_brush_',
-                'pref_other_tool': m + '_tool_',
-                'use_startup_favorites': 'use_' + m + '_startup_favorites',
-                'path_to_startup_favorites': 'path_to_' + m + '_startup_favorites',
-                'brush_library': m + '_brush_library',
-                'wide_popup_layout': 'wide_' + m + '_popup_layout',
-                'wide_popup_layout_size': 'wide_' + m + '_popup_layout_size',
-                'popup_max_tool_columns': 'popup_' + m + '_max_tool_columns',
-                'popup_width': 'popup_' + m + '_width',
-                'preview_frame_scale': 'preview_' + m + '_frame_scale',
-                'popup_items_scale': 'popup_' + m + '_items_scale',
-                'show_def_brushes_in_categories': 'show_' + m + '_def_brushes_in_categories',
-            }
-            self.Modes[im].update(similar_props)
 
-    def show_def_brushes_in_categories(self):
+    @property
+    def Modes(self):
+        return MODE_TABLE
+
+    def _pref(self, key):
         prefs = bpy.context.preferences.addons[Addon_Name].preferences
-        return eval('prefs.' + self.Modes[self.mode].get('show_def_brushes_in_categories'))
+        return MODE_REGISTRY[self.mode].pref_getters[key](prefs)
+
+    def show_def_brushes_in_categories(self):
+        return self._pref('show_def_brushes_in_categories')
 
     def popup_items_scale(self):
-        prefs = bpy.context.preferences.addons[Addon_Name].preferences
-        return eval('prefs.' + self.Modes[self.mode].get('popup_items_scale'))
+        return self._pref('popup_items_scale')
 
     def preview_frame_scale(self):
-        prefs = bpy.context.preferences.addons[Addon_Name].preferences
-        return eval('prefs.' + self.Modes[self.mode].get('preview_frame_scale'))
+        return self._pref('preview_frame_scale')
 
     def popup_width(self):
-        prefs = bpy.context.preferences.addons[Addon_Name].preferences
-        return eval('prefs.' + self.Modes[self.mode].get('popup_width'))
+        return self._pref('popup_width')
 
     def popup_max_tool_columns(self):
-        prefs = bpy.context.preferences.addons[Addon_Name].preferences
-        return eval('prefs.' + self.Modes[self.mode].get('popup_max_tool_columns'))
+        return self._pref('popup_max_tool_columns')
 
     def wide_popup_layout_size(self):
-        prefs = bpy.context.preferences.addons[Addon_Name].preferences
-        return eval('prefs.' + self.Modes[self.mode].get('wide_popup_layout_size'))
+        return self._pref('wide_popup_layout_size')
 
     def wide_popup_layout(self):
-        prefs = bpy.context.preferences.addons[Addon_Name].preferences
-        return eval('prefs.' + self.Modes[self.mode].get('wide_popup_layout'))
+        return self._pref('wide_popup_layout')
 
     def tool_settings(self, context):
-        ts = context.tool_settings
-        return eval('ts.' + self.Modes[self.mode].get('tool_settings'))
+        return MODE_REGISTRY[self.mode].get_tool_settings(context.tool_settings)
 
     def brush_tool(self, brush):
-        return eval('brush.' + self.Modes[self.mode].get('brush_tool'))
+        return MODE_REGISTRY[self.mode].get_brush_tool(brush)
 
     def brush_use_mode(self, brush):
-        return eval('brush.' + self.Modes[self.mode].get('brush_use_mode'))
+        return MODE_REGISTRY[self.mode].get_brush_use_mode(brush)
 
     def def_brushes_tool_list(self):
-        return self.Modes[self.mode].get('def_brushes_tool_list')
+        return MODE_TABLE[self.mode].get('def_brushes_tool_list')
 
     def def_brushes_list(self):
         if not self.mode:
             return None
-        if self.Modes[self.mode].get('is_split_tools'):
-            return self.Modes[self.mode].get('def_brush_names')
+        if MODE_TABLE[self.mode].get('is_split_tools'):
+            return MODE_TABLE[self.mode].get('def_brush_names')
         return [b for t, b in evaluate_brush_tools(self.def_brushes_tool_list(), self.mode)]
 
     def pref_brush(self):
-        return self.Modes[self.mode].get('pref_brush')
+        return MODE_TABLE[self.mode].get('pref_brush')
 
     def pref_tool(self, t_type='brush'):
         if t_type == 'brush':
-            return self.Modes[self.mode].get('pref_tool')
+            return MODE_TABLE[self.mode].get('pref_tool')
         elif t_type == 'other':
-            return self.Modes[self.mode].get('pref_other_tool')
+            return MODE_TABLE[self.mode].get('pref_other_tool')
 
     def brush_tool_enum_items(self):
         enum_items = []
         for brush in bpy.data.brushes:
             if self.brush_use_mode(brush):
                 enum_items = brush.bl_rna.properties[
-                    self.Modes[self.mode].get('brush_tool')].enum_items
+                    MODE_TABLE[self.mode].get('brush_tool')].enum_items
                 break
         return enum_items
 
     def use_startup_favorites(self):
-        prefs = bpy.context.preferences.addons[Addon_Name].preferences
-        return eval('prefs.' + self.Modes[self.mode].get('use_startup_favorites'))
+        return self._pref('use_startup_favorites')
 
     def path_to_startup_favorites(self):
-        prefs = bpy.context.preferences.addons[Addon_Name].preferences
-        return eval('prefs.' + self.Modes[self.mode].get('path_to_startup_favorites'))
+        return self._pref('path_to_startup_favorites')
 
     def icons_path(self):
         prefs = bpy.context.preferences.addons[Addon_Name].preferences
-        folder = self.Modes[self.mode].get('icons_folder')
+        folder = MODE_TABLE[self.mode].get('icons_folder')
         icons_path = get_icon_themes_path(folder)
-        if self.Modes[self.mode].get('has_themes'):
+        if MODE_TABLE[self.mode].get('has_themes'):
             icons_path = os.path.join(icons_path, prefs.brush_icon_theme)
         return icons_path
 
     def fav_settings(self):
         if not self.mode:
             return None
-        scene = bpy.context.scene
-        return eval('scene.' + self.Modes[self.mode].get('fav_settings'))
+        return MODE_REGISTRY[self.mode].get_fav_settings(bpy.context.scene)
 
     def fav_store(self):
         if not self.mode:
             return None
-        wm = bpy.context.window_manager
-        return eval('wm.' + self.Modes[self.mode].get('fav_store'))
+        return MODE_REGISTRY[self.mode].get_fav_store(bpy.context.window_manager)
 
     def library_path(self):
-        prefs = bpy.context.preferences.addons[Addon_Name].preferences
-        return eval('prefs.' + self.Modes[self.mode].get('brush_library'))
+        return self._pref('brush_library')
 
 
 def text_lookup(find_string, source_text):
@@ -444,13 +507,52 @@ def get_b_files(directory):
     return b_files
 
 
-def get_brushes_in_files(directory, b_files):
-    brushes = []
+def read_brushes_in_file(filepath):
+    try:
+        return read_brushes(filepath)
+    except (OSError, BlendFileError):
+        pass
+    brushes = {}
+    with bpy.data.libraries.load(filepath) as (data_from, data_to):
+        for brush in data_from.brushes:
+            # Mode flags and tools are unknown until the brush is appended
+            brushes[brush] = None
+    return brushes
+
+
+def get_directory_library_index(directory):
+    modes = BM_Modes()
+    lib_path = modes.library_path()
+    if not lib_path or not os.path.isdir(lib_path):
+        return None
+    lib_path = os.path.normpath(bpy.path.abspath(lib_path))
+    directory = os.path.normpath(bpy.path.abspath(directory))
+    try:
+        if os.path.commonpath([lib_path, directory]) != lib_path:
+            return None
+    except ValueError:
+        return None
+    return get_library_index(lib_path)
+
+
+def get_indexed_brushes_in_files(directory, b_files):
+    files_brushes = {}
+    index = get_directory_library_index(directory)
     for name in b_files:
         filepath = os.path.join(directory, name)
-        with bpy.data.libraries.load(filepath) as (data_from, data_to):
-            for brush in data_from.brushes:
-                brushes.append(brush)
+        if index is None:
+            files_brushes[filepath] = read_brushes_in_file(filepath)
+            continue
+        files_brushes[filepath] = index.get_brushes(filepath, read_brushes_in_file)
+    if index is not None:
+        index.save()
+    return files_brushes
+
+
+def get_brushes_in_files(directory, b_files):
+    brushes = []
+    for file_brushes in get_indexed_brushes_in_files(directory, b_files).values():
+        brushes += list(file_brushes)
     return brushes
 
 
@@ -478,17 +580,22 @@ def check_brush_type(brush, mode=''):
 
 def get_append_brushes(directory, b_files, default_brushes=False):
     brushes_append = []
-    brushes_in_files = get_brushes_in_files(directory, b_files)
+    files_brushes = get_indexed_brushes_in_files(directory, b_files)
     def_brushes = get_default_brushes_list()
-    for brush in brushes_in_files:
-        if brush in def_brushes and not default_brushes:
-            continue
-        try:
-            if not check_brush_type(bpy.data.brushes[brush], MODE):
-                continue
-        except KeyError:
+    for file_brushes in files_brushes.values():
+        for brush, info in file_brushes.items():
+            if brush in def_brushes and not default_brushes:
                 continue
-        brushes_append.append(brush)
+            if info is not None:
+                if MODE not in info['modes']:
+                    continue
+            else:
+                try:
+                    if not check_brush_type(bpy.data.brushes[brush], MODE):
+                        continue
+                except KeyError:
+                    continue
+            brushes_append.append(brush)
     brushes_append = list(set(brushes_append))
     brushes_append.sort()
     return brushes_append
@@ -529,12 +636,21 @@ def auto_rename(name):
         return name + '.' + digits
 
 
-def append_brushes_from_a_file(filepath, default_brushes=False, duplicates='SKIP'):
+def append_brushes_from_a_file(filepath, default_brushes=False, duplicates='SKIP', index=None):
     brushes = []
     brushes_to_rename = []
     duplicates_list = []
     def_brushes = get_default_brushes_list(mode=MODE)
+    entry = index.get_entry(filepath) if index is not None else None
+    if entry is not None and duplicates == 'SKIP':
+        # Nothing to append if the current file has all the brushes of the library file
+        indexed_brushes = [
+            b for b in entry['brushes'] if b not in def_brushes or default_brushes]
+        if all(b in bpy.data.brushes for b in indexed_brushes):
+            return indexed_brushes
     with bpy.data.libraries.load(filepath) as (data_from, data_to):
+        if index is not None and entry is None:
+            entry = index.set_entry(filepath, dict.fromkeys(data_from.brushes))
         for brush in data_from.brushes:
             if brush in def_brushes and not default_brushes:
                 continue
@@ -553,11 +669,21 @@ def append_brushes_from_a_file(filepath, default_brushes=False, duplicates='SKIP
                 continue
             # !! Append even if the same brush is already exists
             brushes.append(brush)
+        appended_names = list(data_to.brushes)
+    if index is not None:
+        index.update_brushes(filepath, dict(
+            (name, brush_info(brush))
+            for name, brush in zip(appended_names, data_to.brushes)
+            if brush is not None
+        ))
+    # Brushes could be overwritten or renamed with the same number of brushes
+    brush_index.mark_stale()
     for br in brushes_to_rename:
         name = auto_rename(br)
         bpy.data.brushes[br].name = name
         brushes.append(name)
         bpy.data.brushes[br + " {ORIGINAL}"].name = br
+        brush_index.mark_stale()
     return brushes
 
 
@@ -565,12 +691,16 @@ def append_brushes_to_current_file(directory):
     brushes_in_files = []
     b_files = get_b_files(directory)
     modes = BM_Modes()
+    index = get_directory_library_index(directory)
     for name in b_files:
         filepath = os.path.join(directory, name)
         if modes.show_def_brushes_in_categories():
-            brushes_in_files += append_brushes_from_a_file(filepath, default_brushes=True)
+            brushes_in_files += append_brushes_from_a_file(
+                filepath, default_brushes=True, index=index)
         else:
-            brushes_in_files += append_brushes_from_a_file(filepath)
+            brushes_in_files += append_brushes_from_a_file(filepath, index=index)
+    if index is not None:
+        index.save()
     return brushes_in_files
 
 
@@ -624,6 +754,11 @@ def update_brush_list(self, context):
         b_preview_coll.my_previews_dir = ""
 
 
+def update_pref_def_brush_list(self, context):
+    clear_pref_default_brushes()
+    update_brush_list(self, context)
+
+
 def update_fav_list(self, context):
     if context.mode not in BM_Modes.in_modes:
         return None
@@ -638,15 +773,78 @@ def update_fav_list(self, context):
         b_preview_coll.my_previews_dir = ""
 
 
+_category_enum_items = {}
+
+
 def lib_category_folders(self, context):
     prefs = context.preferences.addons[Addon_Name].preferences
     modes = BM_Modes()
     lib_path = modes.library_path()
     default_list = ['Default', 'Current File']
-    folders = get_folders_contains_files(lib_path, ".blend")
-    folders_list = default_list + folders
+    scan = get_library_scan(lib_path)
+    if scan is None or not scan.is_walked:
+        return [(name, name, "") for name in default_list]
+    # Keep the reference to the items list of the scan for the enum property
+    enum_items = _category_enum_items.get(lib_path)
+    if enum_items is None or enum_items[0] is not scan:
+        folders_list = default_list + scan.categories
+        enum_items = (scan, [(name, name, "") for name in folders_list])
+        _category_enum_items[lib_path] = enum_items
+    return enum_items[1]
+
+
+def get_library_scan(lib_path):
+    """Return the scanned categories of the library, start scanning if has not been yet
+    """
+    if not lib_path:
+        return None
+    scan = scanner.get_scan(lib_path)
+    if scan is None:
+        scan = start_library_scan(lib_path)
+    return scan
+
+
+def start_library_scan(lib_path):
+    scan = scanner.scan(lib_path)
+    if scan is not None and not bpy.app.timers.is_registered(library_scan_timer):
+        bpy.app.timers.register(library_scan_timer, first_interval=0.1)
+    return scan
+
+
+def start_libraries_scan():
+    lib_paths = set(
+        BM_Modes(mode).library_path() for mode in BM_Modes.in_modes)
+    for lib_path in lib_paths:
+        start_library_scan(lib_path)
+    return None
 
-    return [(name, name, "") for name in folders_list]
+
+def library_scan_timer():
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type in {'VIEW_3D', 'IMAGE_EDITOR', 'PREFERENCES'}:
+                area.tag_redraw()
+    if scanner.is_scanning():
+        return 0.25
+    save_library_indexes()
+    return None
+
+
+def update_library_path(self, context):
+    lib_paths = set(
+        BM_Modes(mode).library_path() for mode in BM_Modes.in_modes)
+    for lib_path in lib_paths:
+        if scanner.get_scan(lib_path) is None:
+            start_library_scan(lib_path)
+
+
+def draw_library_scan_progress(layout):
+    modes = BM_Modes()
+    scan = scanner.get_scan(modes.library_path())
+    if scan is None or scan.is_finished:
+        return None
+    row = layout.row()
+    row.label(text="Scanning the library: {:.0%}".format(scan.progress), icon='TIME')
 
 
 class WM_OT_Set_Category(Operator):
@@ -670,12 +868,13 @@ class WM_OT_Set_Category(Operator):
 
 
 def filter_brushes_type(brushes_list, mode=''):
+    if mode == '':
+        mode = bpy.context.mode
+    brush_index.ensure(bpy.data.brushes)
     filter_brushes = []
     for b in brushes_list:
-        try:
-            if not check_brush_type(bpy.data.brushes[b], mode):
-                continue
-        except KeyError:
+        info = brush_index.entries.get(b)
+        if info is None or mode not in info['modes']:
             continue
         filter_brushes.append(b)
     filter_brushes = list(set(filter_brushes))
@@ -684,6 +883,9 @@ def filter_brushes_type(brushes_list, mode=''):
 
 
 def get_appended_to_current_brushes(category, directory):
+    prefs = bpy.context.preferences.addons[Addon_Name].preferences
+    if prefs.use_lazy_append_brushes:
+        return get_lazy_category_brushes(directory)
     brushes_added = append_brushes_to_current_file(directory)
     brushes = filter_brushes_type(brushes_added, MODE)
     if len(brushes) == 0:
@@ -692,6 +894,62 @@ def get_appended_to_current_brushes(category, directory):
     return brushes
 
 
+# Brushes of the categories that have not been appended to the current file,
+# brush name: (library file path, brush info of the library index)
+LAZY_BRUSHES = {}
+# Changes when brushes are added to LAZY_BRUSHES, the search metadata is read again
+LAZY_BRUSHES_VERSION = 0
+
+
+def get_lazy_category_brushes(directory):
+    """Return the brushes of the category from the library index, append only the
+    files which brushes are unknown for the index
+    """
+    brushes = []
+    lazy_brushes = {}
+    modes = BM_Modes()
+    default_brushes = modes.show_def_brushes_in_categories()
+    def_brushes = get_default_brushes_list()
+    files_brushes = get_indexed_brushes_in_files(directory, get_b_files(directory))
+    for filepath, file_brushes in files_brushes.items():
+        if any(info is None for info in file_brushes.values()):
+            brushes += filter_brushes_type(
+                append_brushes_from_a_file(filepath, default_brushes=default_brushes), MODE)
+            continue
+        for brush, info in file_brushes.items():
+            if brush in def_brushes and not default_brushes:
+                continue
+            if MODE not in info['modes']:
+                continue
+            # The first file of the category has the brush as it would be appended
+            lazy_brushes.setdefault(brush, (filepath, info))
+            brushes.append(brush)
+    global LAZY_BRUSHES_VERSION
+    if any(LAZY_BRUSHES.get(brush) != value for brush, value in lazy_brushes.items()):
+        LAZY_BRUSHES.update(lazy_brushes)
+        LAZY_BRUSHES_VERSION += 1
+    brushes = list(set(brushes))
+    brushes.sort()
+    return brushes
+
+
+def append_lazy_brushes(brushes):
+    """Append the brushes from their library files if they have been only previewed
+    """
+    files_brushes = {}
+    for brush in brushes:
+        if brush in bpy.data.brushes or brush not in LAZY_BRUSHES:
+            continue
+        files_brushes.setdefault(LAZY_BRUSHES[brush][0], []).append(brush)
+    for filepath, names in files_brushes.items():
+        try:
+            with bpy.data.libraries.load(filepath) as (data_from, data_to):
+                data_to.brushes = [b for b in names if b in data_from.brushes]
+        except OSError:
+            continue
+    return [b for b in brushes if b in bpy.data.brushes]
+
+
 def get_default_brushes_list(list_type='brushes', mode=''):
     if mode != '':
         modes = BM_Modes(mode)
@@ -724,23 +982,32 @@ def check_vertex_paint_brushes():
     return False
 
 
+brush_index = BrushIndex()
+
+
+def subscribe_brush_index():
+    for prop in INDEXED_PROPERTIES:
+        if prop not in bpy.types.Brush.bl_rna.properties:
+            continue
+        bpy.msgbus.subscribe_rna(
+            key=(bpy.types.Brush, prop),
+            owner=brush_index,
+            args=(),
+            notify=brush_index.mark_stale,
+            options={'PERSISTENT'},
+        )
+
+
 def get_current_file_brushes(mode=''):
-    brushes = []
+    if mode == '':
+        mode = bpy.context.mode
     try:
-        for brush in bpy.data.brushes:
-            try:
-                if not check_brush_type(brush, mode):
-                    continue
-                if brush.name == 'Paint':
-                    if bpy.app.version < (3, 2, 0) and\
-                            not check_vertex_paint_brushes():
-                        continue
-                brushes.append(brush.name)
-            except AttributeError:
-                continue
+        brushes = brush_index.names(bpy.data.brushes, mode)
     except AttributeError:
-        pass
-    brushes.sort()
+        return []
+    if 'Paint' in brush_index.entries and mode in brush_index.entries['Paint']['modes']:
+        if bpy.app.version < (3, 2, 0) and not check_vertex_paint_brushes():
+            brushes.remove('Paint')
     return brushes
 
 
@@ -847,19 +1114,20 @@ def get_folders_contains_files(root_folder_path, file_extension=".blend"):
     return folders_list
 
 
+# Search indexes of the category list and of the popup list, ranked by the same recent uses
+recent_brushes = RecentBrushes()
+category_search = BrushSearch(recent_brushes)
+popup_search = BrushSearch(recent_brushes)
+
+
+def get_brush_search_metadata(brush):
+    return brush_metadata(LAZY_BRUSHES.get(brush, ('',))[0])
+
+
 def filter_brushes_by_name(brushes_list, name):
     props = bpy.context.window_manager.brush_manager_props
-    filtered_brushes_list = []
-    for brush in brushes_list:
-        if not props.search_case_sensitive:
-            if not text_lookup(name.lower(), brush.lower()):
-                continue
-        else:
-            if not text_lookup(name, brush):
-                continue
-        filtered_brushes_list.append(brush)
-    filtered_brushes_list.sort()
-    return filtered_brushes_list
+    category_search.update(brushes_list, get_brush_search_metadata, LAZY_BRUSHES_VERSION)
+    return category_search.search(name, props.search_case_sensitive)
 
 
 def get_icon_themes_path(folder_name='icon_themes'):
@@ -920,69 +1188,265 @@ def create_thumbnail_icon(context, brush_name, b_preview_coll):
     icons_path = get_icons_path()
     icon_name = get_icon_name(context, brush_name)
     filepath = os.path.join(icons_path, icon_name)
-    if not os.path.isfile(filepath):
+    if not icon_exists(icons_path, icon_name):
         modes = BM_Modes()
         if modes.Modes[MODE].get('is_split_tools'):
             for b in modes.Modes[MODE].get('def_brush_names'):
                 if text_lookup(b.split(' ')[0], bpy.data.brushes[brush_name].name):
                     icon_name = bpy.data.brushes[b].name.lower() + '.png'
                     break
-        if not os.path.isfile(os.path.join(icons_path, icon_name)):
+        if not icon_exists(icons_path, icon_name):
             icon_name = modes.brush_tool(bpy.data.brushes[brush_name]).lower() + '.png'
-        if not os.path.isfile(os.path.join(icons_path, icon_name)):
+        if not icon_exists(icons_path, icon_name):
             icon_name = 'NA_brush.png'
         filepath = os.path.join(icons_path, icon_name)
     icon = load_preview_icon(context, brush_name, filepath, b_preview_coll)
     return icon.icon_id
 
 
+def create_lazy_thumbnail_icon(context, brush_name, b_preview_coll, use_custom_icon=True):
+    """Icon of a brush which is only in the library index, the custom icon of the brush if it
+    has one like create_thumbnail_icon, else the icon of its tool
+    """
+    lib_filepath, info = LAZY_BRUSHES[brush_name]
+    if use_custom_icon and info.get('use_custom_icon') and info.get('icon_filepath'):
+        filepath = bpy.path.abspath(info['icon_filepath'], start=os.path.dirname(lib_filepath))
+        if os.path.isfile(filepath):
+            icon = load_preview_icon(context, brush_name, filepath, b_preview_coll)
+            return icon.icon_id
+    icons_path = get_icons_path()
+    modes = BM_Modes()
+    icon_names = [info['tools'].get(MODE, '').lower() + '.png', 'NA_brush.png']
+    if modes.Modes[MODE].get('is_split_tools'):
+        icon_names.insert(0, brush_name.lower() + '.png')
+    for icon_name in icon_names:
+        filepath = os.path.join(icons_path, icon_name)
+        if icon_exists(icons_path, icon_name):
+            break
+    icon = load_preview_icon(context, brush_name, filepath, b_preview_coll)
+    return icon.icon_id
+
+
+def get_bip_icon_path(filepath):
+    """Return the compiled .bipr or .bip file of the icon if it exists
+    """
+    for ext in ('.bipr', '.bip'):
+        bip_filepath = os.path.splitext(filepath)[0] + ext
+        if os.path.isfile(bip_filepath):
+            return bip_filepath
+    return filepath
+
+
+_icon_atlases = {}
+# Modification times of the atlases which are older than their icons
+_outdated_atlases = {}
+
+
+def get_icon_atlas(icons_path):
+    """Return the atlas of the icons folder or None if it is missing or older than the icons,
+    an atlas which is built later is used once it is there
+    """
+    icons_path = os.path.normpath(icons_path)
+    atlas = _icon_atlases.get(icons_path)
+    if atlas is not None:
+        return atlas
+    atlas_filepath = icons_path + bip_atlas.EXT
+    try:
+        atlas_time = os.path.getmtime(atlas_filepath)
+        if _outdated_atlases.get(icons_path) == atlas_time:
+            return None
+        if bip_convert.atlas_is_outdated(icons_path, atlas_filepath):
+            _outdated_atlases[icons_path] = atlas_time
+            return None
+        atlas = bip_atlas.Atlas(atlas_filepath)
+    except (OSError, ValueError):
+        return None
+    _icon_atlases[icons_path] = atlas
+    return atlas
+
+
+def close_icon_atlases():
+    for atlas in _icon_atlases.values():
+        atlas.close()
+    _icon_atlases.clear()
+    _outdated_atlases.clear()
+
+
+def icon_exists(icons_path, icon_name):
+    atlas = get_icon_atlas(icons_path)
+    if atlas is not None and os.path.splitext(icon_name)[0] in atlas:
+        return True
+    return os.path.isfile(os.path.join(icons_path, icon_name))
+
+
 def load_preview_icon(context, brush_name, filepath, b_preview_coll):
     prefs = context.preferences.addons[Addon_Name].preferences
     if prefs.use_3dn_bip_previews:
+        name = MODE + '_' + brush_name
+        atlas = get_icon_atlas(os.path.dirname(filepath))
+        key = os.path.splitext(os.path.basename(filepath))[0]
+        if atlas is not None and key in atlas:
+            if name in b_preview_coll:
+                return b_preview_coll[name]
+            return b_preview_coll.load_from_atlas(name, atlas, key)
+        filepath = get_bip_icon_path(filepath)
         return b_preview_coll.load_safe(MODE + '_' + brush_name, filepath, 'IMAGE')
     else:
         return b_preview_coll.load(MODE + '_' + brush_name, filepath, 'IMAGE')
 
 
-def create_enum_list(context, brushes, b_preview_coll, update_icon=False):
+def create_enum_item(context, brush, index, b_preview_coll, default_brushes, update_icon=False):
+    """Return the preview enum item of the brush or None if the brush is missing,
+    default_brushes is called for the sorted default brushes if they are needed
+    """
     props = bpy.context.window_manager.brush_manager_props
+    try:
+        check = bpy.data.brushes[brush]
+    except KeyError:
+        if brush not in LAZY_BRUSHES:
+            return None
+        check = None
+    if update_icon:
+        icon = False
+    else:
+        if UI_MODE:
+            icon = b_preview_coll.get('PAINT_TEXTURE' + '_' + brush)
+        else:
+            icon = b_preview_coll.get(context.mode + '_' + brush)
+    if not icon and check is None:
+        is_default = brush in default_brushes() and props.set_default_brushes_custom_icon
+        thumb = create_lazy_thumbnail_icon(context, brush, b_preview_coll, use_custom_icon=not is_default)
+    elif not icon:
+        is_default = brush in default_brushes() and props.set_default_brushes_custom_icon
+        if bpy.data.brushes[brush].use_custom_icon and not is_default:
+            filepath = bpy.path.abspath(bpy.data.brushes[brush].icon_filepath)
+            if os.path.isfile(bpy.path.abspath(filepath)):
+                # thumb = bpy.data.brushes[brush].preview.icon_id
+                icon = load_preview_icon(context, brush, filepath, b_preview_coll)
+                thumb = icon.icon_id
+            else:
+                thumb = create_thumbnail_icon(context, brush, b_preview_coll)
+        else:
+            thumb = create_thumbnail_icon(context, brush, b_preview_coll)
+    else:
+        thumb = icon.icon_id
+    return (brush, brush, "", thumb, index)
+
+
+def sorted_default_brushes_getter():
+    """Return a function which gets the sorted default brushes on the first call only
+    """
+    default_brushes = []
+
+    def get():
+        if not default_brushes:
+            default_brushes.append(get_sorted_default_brushes(MODE))
+        return default_brushes[0]
+    return get
+
+
+def create_enum_list(context, brushes, b_preview_coll, update_icon=False):
     global UPDATE_ICONS
     if UPDATE_ICONS or update_icon:
         update_icon = True
         b_preview_coll.clear()
-    icons_path = get_icons_path()
+        if b_preview_coll is get_preview_brushes_collection():
+            # The cached enum items refer to the icons of the cleared collection
+            clear_category_cache()
     enum_items = []
-    default_brushes = get_sorted_default_brushes(MODE)
+    default_brushes = sorted_default_brushes_getter()
     for index, brush in enumerate(brushes):
-        try:
-            check = bpy.data.brushes[brush]
-        except KeyError:
-            continue
-        if update_icon:
-            icon = False
-        else:
-            if UI_MODE:
-                icon = b_preview_coll.get('PAINT_TEXTURE' + '_' + brush)
-            else:
-                icon = b_preview_coll.get(context.mode + '_' + brush)
-        if not icon:
-            is_default = brush in default_brushes and props.set_default_brushes_custom_icon
-            if bpy.data.brushes[brush].use_custom_icon and not is_default:
-                filepath = bpy.path.abspath(bpy.data.brushes[brush].icon_filepath)
-                if os.path.isfile(bpy.path.abspath(filepath)):
-                    # thumb = bpy.data.brushes[brush].preview.icon_id
-                    icon = load_preview_icon(context, brush, filepath, b_preview_coll)
-                    thumb = icon.icon_id
-                else:
-                    thumb = create_thumbnail_icon(context, brush, b_preview_coll)
-            else:
-                thumb = create_thumbnail_icon(context, brush, b_preview_coll)
-        else:
-            thumb = icon.icon_id
-        enum_items.append((brush, brush, "", thumb, index))
+        item = create_enum_item(context, brush, index, b_preview_coll, default_brushes, update_icon)
+        if item is not None:
+            enum_items.append(item)
+    if b_preview_coll is get_preview_brushes_collection(coll_type='favorites'):
+        prioritize_preview_icons(brushes, b_preview_coll, priority=0)
+    else:
+        prioritize_preview_icons(brushes[:PREVIEW_FIRST_PAGE], b_preview_coll)
+    return enum_items
+
+
+def update_enum_list(context, enum_items, brushes, b_preview_coll):
+    """Return the enum items of the brushes made from the current ones, only the icons of the
+    added brushes are looked up and the previews of the removed ones are released
+    """
+    if UPDATE_ICONS:
+        return create_enum_list(context, brushes, b_preview_coll)
+    default_brushes = sorted_default_brushes_getter()
+    added = []
+
+    def make_item(brush, number):
+        item = create_enum_item(context, brush, number, b_preview_coll, default_brushes)
+        if item is not None:
+            added.append(brush)
+        return item
+
+    # Items of another mode or restored on undo may refer to previews which are not in the list
+    enum_items = [item for item in enum_items if MODE + '_' + item[0] in b_preview_coll]
+    enum_items = update_enum_items(enum_items, brushes, make_item)[0]
+    # Release every preview the new items don't use, not only the ones of the removed items
+    names = {MODE + '_' + item[0] for item in enum_items}
+    for name in b_preview_coll.names():
+        if name not in names:
+            b_preview_coll.pop(name)
+    prioritize_preview_icons(added, b_preview_coll, priority=0)
     return enum_items
 
 
+def get_favorites_enum_items():
+    prefs = bpy.context.preferences.addons[Addon_Name].preferences
+    if not prefs.use_3dn_bip_previews:
+        return get_preview_brushes_collection(coll_type='favorites').my_previews
+    return _enum_items_fav
+
+
+def rename_favorite_brush(old_name, new_name):
+    """Rename the brush in the favorites list, it keeps its icon
+    """
+    global _enum_items_fav
+    prefs = bpy.context.preferences.addons[Addon_Name].preferences
+    b_preview_coll = get_preview_brushes_collection(coll_type='favorites')
+    enum_items = get_favorites_enum_items()
+    if old_name not in [item[0] for item in enum_items]:
+        return None
+    b_preview_coll.rename(MODE + '_' + old_name, MODE + '_' + new_name)
+    enum_items = rename_enum_item(enum_items, old_name, new_name)
+    _enum_items_fav = enum_items
+    if not prefs.use_3dn_bip_previews:
+        b_preview_coll.my_previews = enum_items
+
+
+# Number of the category brushes which icons are loaded before the rest
+PREVIEW_FIRST_PAGE = 24
+
+
+def prioritize_preview_icons(brushes, b_preview_coll, priority=1):
+    """Load the icons of the brushes before the other pending icons
+    """
+    prefs = bpy.context.preferences.addons[Addon_Name].preferences
+    if not prefs.use_3dn_bip_previews:
+        return None
+    b_preview_coll.prioritize([MODE + '_' + b for b in brushes], priority)
+
+
+_visible_preview_names = set()
+
+
+def update_visible_preview_icons(enum_items, b_preview_coll):
+    """Stop loading the icons of the brushes which left the category list and load again the ones
+    which came back to it
+    """
+    global _visible_preview_names
+    prefs = bpy.context.preferences.addons[Addon_Name].preferences
+    if not prefs.use_3dn_bip_previews:
+        return None
+    names = {MODE + '_' + item[0] for item in enum_items}
+    b_preview_coll.cancel_many(list(_visible_preview_names - names))
+    b_preview_coll.resume([MODE + '_' + item[0] for item in enum_items])
+    prioritize_preview_icons([item[0] for item in enum_items[:PREVIEW_FIRST_PAGE]], b_preview_coll)
+    _visible_preview_names = names
+
+
 def reset_all_default_brushes(context):
     if context.mode != 'SCULPT':
         return None
@@ -1019,6 +1483,8 @@ def create_default_sculpt_tools():
         current_tools.append(bpy.data.brushes[brush].sculpt_tool)
         if brush == 'Multiplane Scrape':
             bpy.data.brushes[brush].name = 'Multi-plane Scrape'
+            brush_index.rename(brush, bpy.data.brushes['Multi-plane Scrape'])
+            rename_favorite_brush(brush, 'Multi-plane Scrape')
     for tool in sculpt_tools:
         if tool in current_tools:
             continue
@@ -1069,6 +1535,8 @@ def create_default_smear_tools():
                 bpy.data.brushes[b].name.split('.')[-1] == '002') or (
                 bpy.data.brushes[b].name.split('.')[-1] == '003')):
             bpy.data.brushes[b].name = smear_name
+            brush_index.rename(b, bpy.data.brushes[smear_name])
+            rename_favorite_brush(b, smear_name)
             IS_INIT_SMEAR[bpy.context.mode] = True
             break
     set_active_tool(tool_active_id)
@@ -1187,10 +1655,14 @@ def get_preview_brushes_collection(coll_type='main'):
 def create_preview_collection_list(context, brushes, b_preview_coll, coll_type='favorites'):
     global _enum_items, _enum_items_fav, _fav_list
     prefs = context.preferences.addons[Addon_Name].preferences
-    enum_items = create_enum_list(context, brushes, b_preview_coll)
     if coll_type == 'favorites':
+        # The favorites are stored in the current file
+        append_lazy_brushes(brushes)
+        enum_items = update_enum_list(context, get_favorites_enum_items(), brushes, b_preview_coll)
         _fav_list = None
         _enum_items_fav = enum_items
+    else:
+        enum_items = create_enum_list(context, brushes, b_preview_coll)
     if not prefs.use_3dn_bip_previews:
         b_preview_coll.my_previews = enum_items
 
@@ -1208,6 +1680,63 @@ def clear_preview_collection_list(b_preview_coll, coll_list='favorites'):
         remove_def_brushes()
 
 
+CATEGORY_CACHE_SIZE = 8
+_category_cache = OrderedDict()
+
+
+def get_category_fingerprint(directory):
+    """Modification times of the category folder and its .blend files
+    """
+    try:
+        fingerprint = [os.stat(directory).st_mtime]
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(".blend"):
+                    fingerprint.append((entry.name, entry.stat().st_mtime))
+    except OSError:
+        return None
+    fingerprint.sort(key=str)
+    return fingerprint
+
+
+def get_category_cache_key(context, directory):
+    props = context.window_manager.brush_manager_props
+    search = None
+    if props.search_in_category:
+        search = (str(props.search_bar.decode("utf-8")), props.search_case_sensitive)
+    return (MODE, directory, search, get_icons_path())
+
+
+def get_cached_category(key):
+    """Return the enum items of the category if it has not been changed since cached
+    """
+    cached = _category_cache.get(key)
+    if cached is None:
+        return None
+    fingerprint, brushes, enum_items = cached
+    is_valid = fingerprint == get_category_fingerprint(key[1]) and all(
+        b in bpy.data.brushes or b in LAZY_BRUSHES for b in brushes)
+    if not is_valid:
+        del _category_cache[key]
+        return None
+    _category_cache.move_to_end(key)
+    return enum_items
+
+
+def cache_category(key, brushes, enum_items):
+    fingerprint = get_category_fingerprint(key[1])
+    if fingerprint is None:
+        return None
+    _category_cache[key] = (fingerprint, brushes, enum_items)
+    _category_cache.move_to_end(key)
+    while len(_category_cache) > CATEGORY_CACHE_SIZE:
+        _category_cache.popitem(last=False)
+
+
+def clear_category_cache():
+    _category_cache.clear()
+
+
 def preview_brushes_in_folders(self, context):
     global _enum_items, _directory
     prefs = context.preferences.addons[Addon_Name].preferences
@@ -1235,16 +1764,27 @@ def preview_brushes_in_folders(self, context):
     elif selected_category_name == 'Current File':
         brushes = get_current_file_brushes(MODE)
     elif selected_category_name:
+        cache_key = get_category_cache_key(context, directory)
+        enum_items = get_cached_category(cache_key)
+        if enum_items is not None:
+            _directory = directory
+            _enum_items = enum_items
+            update_visible_preview_icons(_enum_items, b_preview_coll)
+            if not prefs.use_3dn_bip_previews:
+                b_preview_coll.my_previews_dir = directory
+                b_preview_coll.my_previews = _enum_items
+            return _enum_items
         brushes = get_appended_to_current_brushes(selected_category_name, directory)
     props.post_undo_last = False
 
     if props.search_in_category:
         brushes = filter_brushes_by_name(brushes, str(props.search_bar.decode("utf-8")))
-        brushes.sort()
 
-    _enum_items.clear()
     _directory = directory
     _enum_items = create_enum_list(context, brushes, b_preview_coll)
+    update_visible_preview_icons(_enum_items, b_preview_coll)
+    if selected_category_name not in {'Default', 'Current File'}:
+        cache_category(cache_key, brushes, _enum_items)
     if not prefs.use_3dn_bip_previews:
         b_preview_coll.my_previews_dir = directory
         b_preview_coll.my_previews = _enum_items
@@ -1268,9 +1808,8 @@ def preview_brushes_in_favorites(self, context):
             return _enum_items_fav
 
     brushes = get_favorite_brushes()
-    _enum_items_fav.clear()
     _fav_list = fav_list
-    _enum_items_fav = create_enum_list(context, brushes, b_preview_coll)
+    _enum_items_fav = update_enum_list(context, get_favorites_enum_items(), brushes, b_preview_coll)
     if not prefs.use_3dn_bip_previews:
         b_preview_coll.my_previews_dir = fav_list
         b_preview_coll.my_previews = _enum_items_fav
@@ -1280,7 +1819,41 @@ def preview_brushes_in_favorites(self, context):
     return _enum_items_fav
 
 
+def update_preview_threads(self, context):
+    bip_settings.MAX_THREADS = self.preview_threads
+    previews.resize()
+
+
+def update_preview_use_numpy(self, context):
+    bip_settings.USE_NUMPY = self.preview_use_numpy
+
+
+def update_preview_decode_processes(self, context):
+    bip_settings.DECODE_PROCESSES = self.preview_decode_processes
+    if not self.preview_decode_processes:
+        bip_processes.shutdown()
+
+
+def update_preview_cache_size(self, context):
+    bip_settings.CACHE_MAX_SIZE = self.preview_cache_size * 1024 * 1024
+    bip_settings.CACHE_DIR = get_preview_cache_dir() if self.preview_cache_size else ''
+
+
+def get_preview_cache_dir():
+    return os.path.join(bpy.utils.user_resource('CONFIG'), Addon_Name, 'preview_cache')
+
+
+def get_pillow_formats_file():
+    return os.path.join(bpy.utils.user_resource('CONFIG'), Addon_Name, 'pillow_formats.json')
+
+
+def update_lazy_append_brushes(self, context):
+    clear_category_cache()
+    update_brush_list(self, context)
+
+
 def update_use_3dn_bip_previews(self, context):
+    clear_category_cache()
     if not self.use_3dn_bip_previews:
         b_preview_coll = get_preview_brushes_collection(coll_type='favorites')
         b_preview_coll.my_previews = _enum_items_fav
@@ -1304,6 +1877,7 @@ def set_brush_tool(self, context, brush):
             set_active_tool("builtin_brush." + tool_name)
     tool_settings_mode = modes.tool_settings(context)
     tool_settings_mode.brush = brush
+    recent_brushes.use(brush.name)
 
 
 def set_brush_from_lib_list(self, context):
@@ -1315,6 +1889,7 @@ def set_brush_from_lib_list(self, context):
         selected_brush = self.brush
     else:
         selected_brush = context.window_manager.brushes_in_files
+    append_lazy_brushes([selected_brush])
     try:
         set_brush_tool(self, context, bpy.data.brushes[selected_brush])
     except KeyError:
@@ -1573,20 +2148,10 @@ def update_icon_theme(self, context):
 
 
 def remove_fav_brush(self, context, remove_brushes):
-    prefs = bpy.context.preferences.addons[Addon_Name].preferences
     b_preview_coll = get_preview_brushes_collection(coll_type='favorites')
-    brushes = get_favorite_brushes()
-    for b in remove_brushes:
-        try:
-            if prefs.use_3dn_bip_previews:
-                _enum_items_fav.pop(brushes.index(b))
-                # b_preview_coll.pop(MODE + '_' + b)
-            brushes.remove(b)
-        except ValueError:
-            # self.report({'ERROR'}, msg)
-            continue
-    if not prefs.use_3dn_bip_previews:
-        create_preview_collection_list(context, brushes, b_preview_coll)
+    remove_brushes = set(remove_brushes)
+    brushes = [b for b in get_favorite_brushes() if b not in remove_brushes]
+    create_preview_collection_list(context, brushes, b_preview_coll)
 
 
 def remove_def_brushes():
@@ -1594,6 +2159,7 @@ def remove_def_brushes():
     b_preview_coll = get_preview_brushes_collection()
     if prefs.use_3dn_bip_previews:
         b_preview_coll.clear()
+        clear_category_cache()
 
 
 def remove_active_brush_favorite(self, context, fav_type='preview'):
@@ -1604,11 +2170,18 @@ def remove_active_brush_favorite(self, context, fav_type='preview'):
     remove_fav_brush(self, context, [active_brush])
 
 
-def get_pref_default_brush_props(list_type='', mode=''):
-    prefs = bpy.context.preferences.addons[Addon_Name].preferences
-    if mode == '':
-        mode = MODE
+# Enabled default brushes and tools of the preferences by mode and list type,
+# cleared by the update functions of the preferences, on register and on file load
+# as reverting or loading the preferences calls no update functions
+PREF_DEF_BRUSHES = {}
+
 
+def clear_pref_default_brushes(self=None, context=None):
+    PREF_DEF_BRUSHES.clear()
+
+
+def read_pref_default_brush_props(list_type, mode):
+    prefs = bpy.context.preferences.addons[Addon_Name].preferences
     modes = BM_Modes(mode)
     if list_type == 'tools':
         props_list = [pr for pr in prefs.__annotations__ if pr.startswith(modes.pref_tool())]
@@ -1618,29 +2191,36 @@ def get_pref_default_brush_props(list_type='', mode=''):
         props_list = [pr for pr in prefs.__annotations__ if pr.startswith(modes.pref_brush())]
         b_tools = dict(evaluate_brush_tools(modes.def_brushes_tool_list(), mode))
 
-    props_values = []
+    props_values = {}
     for pr in props_list:
         b_name = prefs.bl_rna.properties[pr].name
-        if list_type == 'tools' or list_type == 'other_tools':
-            exec("props_values.append((b_name, prefs." + pr + "))")
-        else:
-            if modes.Modes[mode].get('is_split_tools'):
-                exec("props_values.append((b_name, prefs." + pr + "))")
-            else:
-                exec("props_values.append((b_tools.get(b_name), prefs." + pr + "))")
-    props_values = dict(props_values)
+        if list_type != 'tools' and list_type != 'other_tools' and\
+                not modes.Modes[mode].get('is_split_tools'):
+            b_name = b_tools.get(b_name)
+        props_values[b_name] = getattr(prefs, pr)
+    return props_values
+
+
+def get_pref_default_brush_props(list_type='', mode=''):
+    if mode == '':
+        mode = MODE
+    key = (mode, list_type)
+    props_values = PREF_DEF_BRUSHES.get(key)
+    if props_values is None:
+        props_values = PREF_DEF_BRUSHES[key] = read_pref_default_brush_props(list_type, mode)
     return props_values
 
 
 def get_pref_custom_def_brush_props(list_type=''):
     if list_type != 'SCULPT':
         return []
-    prefs = bpy.context.preferences.addons[Addon_Name].preferences
-    custom_props_list = [pr for pr in prefs.__annotations__ if pr.startswith("add_def_brush_")]
-    props_values = []
-    for pr in custom_props_list:
-        exec("if prefs." + pr + " != '': props_values.append(prefs." + pr + ")")
-    return props_values
+    props_values = PREF_DEF_BRUSHES.get('custom')
+    if props_values is None:
+        prefs = bpy.context.preferences.addons[Addon_Name].preferences
+        custom_props_list = [pr for pr in prefs.__annotations__ if pr.startswith("add_def_brush_")]
+        props_values = [getattr(prefs, pr) for pr in custom_props_list]
+        props_values = PREF_DEF_BRUSHES['custom'] = [v for v in props_values if v != '']
+    return list(props_values)
 
 
 def get_pref_default_brushes(list_type=''):
@@ -1666,7 +2246,7 @@ def get_sorted_default_brushes(list_type=''):
         tools = get_default_brushes_list(list_type='tools')
     modes = BM_Modes(list_type)
     for brush in current_brushes:
-        tool = modes.brush_tool(bpy.data.brushes[brush])
+        tool = brush_index.entries[brush]['tools'].get(modes.mode)
         if tool in tools:
             continue
         default_brushes.append(brush)
@@ -1833,6 +2413,7 @@ class WM_OT_Delete_Zero_User_Brushes(Operator):
                 continue
             remove_brushes.append(brush.name)
             bpy.data.brushes.remove(brush, do_unlink=True)
+            brush_index.remove(remove_brushes[-1])
         fav_brushes = get_favorite_brushes()
         remove_favorites = [b for b in remove_brushes if b in fav_brushes]
         remove_fav_brush(self, context, remove_favorites)
@@ -1862,6 +2443,7 @@ class WM_OT_Delete_Active_Brush_Data(Operator):
             remove_fav_brush(self, context, [brush_name])
             set_first_preview_item(context, fav_brushes, wm_enum_prop='fav')
         bpy.data.brushes.remove(active_brush_data, do_unlink=True)
+        brush_index.remove(brush_name)
         update_brush_list(self, context)
         update_fav_list(self, context)
 
@@ -1872,6 +2454,63 @@ class WM_OT_Delete_Active_Brush_Data(Operator):
         return context.window_manager.invoke_confirm(self, event)
 
 
+ICON_FOLDERS = ['icon_themes', 'paint_icons', 'gpaint_icons', 'wpaint_icons', 'vpaint_icons']
+
+
+def get_icon_atlas_folders(paths):
+    """Return the folders which contain icons, each of them is packed into an atlas
+    """
+    folders = []
+    for path in paths:
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            if any(f.lower().endswith('.png') for f in filenames):
+                folders.append(dirpath)
+    return folders
+
+
+class WM_OT_Compile_Icon_Themes(Operator):
+    bl_label = 'Compile Icon Themes'
+    bl_idname = 'bm.compile_icon_themes'
+    bl_description = (
+        "Convert the icons of the add-on to .bip files which 3DN BIP library loads faster "
+        "and without Pillow. Pillow is required for the conversion"
+    )
+
+    force: BoolProperty(
+        name="Force",
+        default=False,
+        description="Convert again the icons which .bip files are up to date",
+    )
+
+    def execute(self, context):
+        if not support_pillow():
+            self.report({'ERROR'}, "Brush Manager: Pillow is required to compile the icon themes")
+            return {'CANCELLED'}
+        paths = [get_icon_themes_path(folder) for folder in ICON_FOLDERS]
+        converted, failed = bip_convert.convert(paths, force=self.force)
+        # The atlases are rewritten, the mapped ones have to be closed before
+        close_icon_atlases()
+        for folder in get_icon_atlas_folders(paths):
+            try:
+                bip_convert.build_atlas(folder)
+            except Exception as e:
+                failed.append((folder, str(e)))
+        for src, error in failed:
+            print("Brush Manager Error: " + src + ": " + error)
+        global UPDATE_ICONS
+        UPDATE_ICONS = True
+        update_category(self, context)
+        msg = "Compiled " + str(len(converted)) + " icons"
+        if failed:
+            msg += ", " + str(len(failed)) + " failed (see the console)"
+            self.report({'WARNING'}, msg)
+        else:
+            self.report({'INFO'}, msg)
+
+        return {'FINISHED'}
+
+
 class WM_OT_Refresh_Category_List(Operator):
     bl_label = 'Refresh the Category List'
     bl_idname = 'bm.update_category_list'
@@ -1880,6 +2519,9 @@ class WM_OT_Refresh_Category_List(Operator):
     def execute(self, context):
         global UPDATE_ICONS
         UPDATE_ICONS = True
+        modes = BM_Modes()
+        start_library_scan(modes.library_path())
+        clear_category_cache()
         update_category(self, context)
 
         return {'FINISHED'}
@@ -1986,7 +2628,7 @@ class WM_OT_Save_Brushes_to_Category(Operator):
     def __init__(self):
         if self.pick_list:
             global PICK_EDIT_LIST
-            brushes_in_cat = get_popup_add_list()
+            brushes_in_cat = get_popup_add_list(name_matches=True)
             self.brushes = [b for b in brushes_in_cat if b in PICK_EDIT_LIST]
         else:
             self.brushes = get_favorite_brushes()
@@ -2063,6 +2705,7 @@ class WM_OT_Save_Brushes_to_Category(Operator):
             return {'FINISHED'}
 
         save_brushes_to_file(brushes_data, blend_filepath, relative_path_remap=self.relative_remap)
+        start_library_scan(lib_path)
         update_brush_list(self, context)
         msg = "Brushes Saved to: " + blend_filepath
         self.report({'INFO'}, msg)
@@ -2489,6 +3132,7 @@ class BM_Side_Panel:
             row = layout.row()
             row.prop(props, "search_bar", text='')
             row.prop(props, "search_case_sensitive", text='', icon='SMALL_CAPS')
+        draw_library_scan_progress(layout)
         row = layout.row(align=True)
         if MODE == 'SCULPT' and not prefs.sculpt_hide_preview:
             row.template_icon_view(
@@ -2808,6 +3452,18 @@ def draw_3dn_bip_installation(self, context, layout):
     sub_row.operator("bm.t3dn_bip_install_pillow", text=text)
     row = row.row()
     row.prop(self, "t3dn_bip_and_pillow_info", text='', icon='QUESTION')
+    row = box.row()
+    row.enabled = self.use_3dn_bip_previews
+    sub_row = row.row(align=True)
+    sub_row.prop(self, "preview_threads")
+    sub_row.prop(self, "preview_decode_processes", text='', icon='SYSTEM')
+    sub_row.prop(self, "preview_use_numpy", text='', icon='MOD_ARRAY')
+    sub_row = row.row(align=True)
+    sub_row.prop(self, "preview_cache_size")
+    sub_row.operator("bm.t3dn_bip_purge_cache", text='', icon='TRASH')
+    sub_row = row.row()
+    sub_row.enabled = support_pillow()
+    sub_row.operator("bm.compile_icon_themes", icon='IMAGE_DATA')
     if self.t3dn_bip_and_pillow_info:
         box = layout.box()
         if support_pillow():
@@ -2857,6 +3513,7 @@ def draw_preferences(self, context, layout):
         if get_app_version() >= 2.90:
             grid.prop(self, "use_pref_editor_settings")
         grid.prop(self, "close_popup_on_select")
+        grid.prop(self, "use_lazy_append_brushes")
         grid.prop(self, "popup_tools")
         grid.prop(self, "brush_tools")
         grid.prop(self, "hide_annotate_tools")
@@ -2968,7 +3625,7 @@ class BrushManager_Preferences(AddonPreferences):
         exec(
             prop + ": StringProperty("
             "name='', subtype='DIR_PATH',"
-            "description=description)"
+            "description=description, update=update_library_path)"
         )
         prop = modes.Modes[m].get('use_startup_favorites')
         name = "Use Startup Favorites"
@@ -3063,6 +3720,36 @@ class BrushManager_Preferences(AddonPreferences):
         ),
         update=update_use_3dn_bip_previews
     )
+    preview_threads: IntProperty(
+        name="Loading Threads",
+        description="Number of background threads that load the icon previews with 3DN BIP library",
+        default=bip_settings.MAX_THREADS, min=1, max=16,
+        update=update_preview_threads
+    )
+    preview_decode_processes: BoolProperty(
+        name="Decode in Separate Processes",
+        description=(
+            "Decode the icon images with 3DN BIP library in separate Python processes, "
+            "which is faster for many PNG icons on multi-core systems"
+        ),
+        default=False,
+        update=update_preview_decode_processes
+    )
+    preview_use_numpy: BoolProperty(
+        name="Convert Icons with NumPy",
+        description=(
+            "Flip and downsample the decoded icon images with NumPy, several at once. "
+            "Faster for many icons, but the downsampled icons look slightly different"
+        ),
+        default=False,
+        update=update_preview_use_numpy
+    )
+    preview_cache_size: IntProperty(
+        name="Preview Cache (MB)",
+        description="Max size of the disk cache of decoded icon previews, 0 to turn the cache off",
+        default=64, min=0, max=4096,
+        update=update_preview_cache_size
+    )
     t3dn_bip_and_pillow_info: BoolProperty(
         name="Pillow Info",
         default=False,
@@ -3212,6 +3899,15 @@ class BrushManager_Preferences(AddonPreferences):
         description='Close popup windows when brush or tool have been selected',
         default=True,
     )
+    use_lazy_append_brushes: BoolProperty(
+        name='Append Brushes on Select',
+        description=(
+            'Preview the category brushes from the library index and append a brush '
+            'to the current file only when it is selected or added to the Favorites'
+        ),
+        default=False,
+        update=update_lazy_append_brushes,
+    )
     for bm_mode in modes.in_modes:
         is_split_tools = modes.Modes[bm_mode].get('is_split_tools')
         if is_split_tools:
@@ -3227,17 +3923,17 @@ class BrushManager_Preferences(AddonPreferences):
                 func = 'update_pref_def_' + bm + '_brush'
                 exec(default_brush + ': BoolProperty(name="' + brush + '", default = True, update=' + func + ')')
             else:
-                exec(default_brush + ': BoolProperty(name="' + brush + '", default = True, update=update_brush_list)')
+                exec(default_brush + ': BoolProperty(name="' + brush + '", default = True, update=update_pref_def_brush_list)')
             if is_split_tools:
                 continue
             tool_brush = bm + '_tool_brush_' + b
-            exec(tool_brush + ': BoolProperty(name="' + brush + '", default = True)')
+            exec(tool_brush + ': BoolProperty(name="' + brush + '", default = True, update=clear_pref_default_brushes)')
         o_tools = modes.Modes[bm_mode].get('other_tools_list')
         for o_tool in o_tools:
             b = o_tool.replace(' ', '')
             b = b.replace('-', '')
             other_tool = bm + '_tool_' + b
-            exec(other_tool + ': BoolProperty(name="' + o_tool + '", default = True)')
+            exec(other_tool + ': BoolProperty(name="' + o_tool + '", default = True, update=clear_pref_default_brushes)')
         if not is_split_tools:
             continue
         b_tools = modes.Modes[bm_mode].get('def_brushes_tool_list')
@@ -3245,7 +3941,7 @@ class BrushManager_Preferences(AddonPreferences):
             b = b_tool.replace(' ', '')
             b = b.replace('-', '')
             tool_brush = bm + '_tool_brush_' + b
-            exec(tool_brush + ': BoolProperty(name="' + b_tool + '", default = True)')
+            exec(tool_brush + ': BoolProperty(name="' + b_tool + '", default = True, update=clear_pref_default_brushes)')
     del b
     del other_tool
     del tool_brush
@@ -3268,7 +3964,7 @@ class BrushManager_Preferences(AddonPreferences):
  Brush Manager will treat it as a Default brush that initialy will be listed in the\
  Default category on a file load if it exists in the loaded data"
     for i in range(12):
-        exec("add_def_brush_" + str(i) + ": StringProperty(name='" + name + "', description='" + description + "')")
+        exec("add_def_brush_" + str(i) + ": StringProperty(name='" + name + "', description='" + description + "', update=clear_pref_default_brushes)")
 
     def draw(self, context):
         # prefs = context.preferences.addons[Addon_Name].preferences
@@ -3317,6 +4013,7 @@ def brush_manager_pre_undo(scene):
 
 
 def brush_manager_post_undo(scene):
+    brush_index.mark_stale()
     try:
         props = bpy.context.window_manager.brush_manager_props
     except AttributeError:
@@ -3356,6 +4053,11 @@ def brush_manager_on_file_load(dummy):
     FAV_SETTINGS_LOADED.clear()
     START_FAV_LOADED.clear()
     IS_INIT_SMEAR.clear()
+    brush_index.mark_stale()
+    # Loading a file removes the message bus subscriptions, persistent or not
+    bpy.msgbus.clear_by_owner(brush_index)
+    subscribe_brush_index()
+    clear_pref_default_brushes()
     MODE = None
     UI_MODE = False
     try:
@@ -3365,6 +4067,7 @@ def brush_manager_on_file_load(dummy):
     set_brushes_data_collection_items()
     clear_favorites_list()
     clear_Default_list()
+    clear_category_cache()
     global _directory, _fav_list
     _directory = None
     _fav_list = None
@@ -3410,7 +4113,11 @@ def set_category_collection_items():
         return None
     modes = BM_Modes()
     lib_path = modes.library_path()
-    folders = get_folders_contains_files(lib_path, ".blend")
+    scan = get_library_scan(lib_path)
+    if scan is not None and scan.is_walked:
+        folders = scan.categories
+    else:
+        folders = get_folders_contains_files(lib_path, ".blend")
     category_list.clear()
     for name in folders:
         item = category_list.add()
@@ -3698,6 +4405,7 @@ class POPUP_OT_Tools_and_Brushes(Operator):
             row = col_one.row(align=True)
             row.prop(props, "search_bar", text='')
             row.prop(props, "search_case_sensitive", text='', icon='SMALL_CAPS')
+        draw_library_scan_progress(col_one)
         row = col_one.row(align=True)
         if MODE == 'SCULPT' and not prefs.sculpt_hide_preview:
             if not prefs.sculpt_hide_preview:
@@ -3721,6 +4429,8 @@ class POPUP_OT_Tools_and_Brushes(Operator):
         row = col_one.row(align=True)
         col = row.column(align=True)
         enums = preview_brushes_in_favorites(self, context)
+        prioritize_preview_icons(
+            get_favorite_brushes(), get_preview_brushes_collection(coll_type='favorites'), priority=0)
         icons = get_favorite_brushes(list_type='icons')
         for i, icon in enumerate(icons):
             col.template_icon(icon_value=icon, scale=popup_items_scale)
@@ -3862,7 +4572,7 @@ class WM_OT_Pick_Select_All_Brushes(Operator):
 
     def execute(self, context):
         global PICK_EDIT_LIST
-        PICK_EDIT_LIST = get_popup_add_list()
+        PICK_EDIT_LIST = get_popup_add_list(name_matches=True)
         return {'FINISHED'}
 
 
@@ -3884,7 +4594,7 @@ class WM_OT_Pick_Invert_Selected_Brushes(Operator):
 
     def execute(self, context):
         global PICK_EDIT_LIST
-        PICK_EDIT_LIST = [b for b in get_popup_add_list() if b not in PICK_EDIT_LIST]
+        PICK_EDIT_LIST = [b for b in get_popup_add_list(name_matches=True) if b not in PICK_EDIT_LIST]
         return {'FINISHED'}
 
 
@@ -3895,8 +4605,7 @@ class WM_OT_Pick_Delete_Brush_Data(Operator):
 
     def execute(self, context):
         global PICK_EDIT_LIST
-        global BRUSHES_IN_CATEGORY
-        brushes_in_cat = get_popup_add_list()
+        brushes_in_cat = get_popup_add_list(name_matches=True)
         remove_brushes = [b for b in brushes_in_cat if b in PICK_EDIT_LIST]
         if not remove_brushes:
             msg = "Brush Manager: Brushes has not been selected."
@@ -3906,11 +4615,7 @@ class WM_OT_Pick_Delete_Brush_Data(Operator):
         remove_favorites = [b for b in remove_brushes if b in fav_brushes]
         remove_fav_brush(self, context, remove_favorites)
         set_first_preview_item(context, fav_brushes, wm_enum_prop='fav')
-        BRUSHES_IN_CATEGORY = [
-            (n1, n2, b, iid, i)
-            for n1, n2, b, iid, i in BRUSHES_IN_CATEGORY
-            if n1 not in remove_brushes
-        ]
+        remove_brushes_in_category_list_popup(remove_brushes)
         props = context.window_manager.brush_manager_props
         props.lib_categories = 'Current File'
         for brush in remove_brushes:
@@ -3919,6 +4624,7 @@ class WM_OT_Pick_Delete_Brush_Data(Operator):
             except KeyError:
                 continue
             bpy.data.brushes.remove(b, do_unlink=True)
+            brush_index.remove(brush)
         update_brush_list(self, context)
         return {'FINISHED'}
 
@@ -3934,7 +4640,7 @@ class WM_OT_Pick_Refresh_Brush_Data(Operator):
     def execute(self, context):
         global PICK_EDIT_LIST
         global BRUSHES_IN_CATEGORY
-        brushes_in_cat = get_popup_add_list()
+        brushes_in_cat = get_popup_add_list(name_matches=True)
         remove_brushes = [b for b in brushes_in_cat if b in PICK_EDIT_LIST]
         if not remove_brushes:
             msg = "Brush Manager: Brushes has not been selected."
@@ -3949,6 +4655,7 @@ class WM_OT_Pick_Refresh_Brush_Data(Operator):
             except KeyError:
                 continue
             bpy.data.brushes.remove(b, do_unlink=True)
+            brush_index.remove(brush)
 
         global UPDATE_ICONS
         UPDATE_ICONS = True
@@ -3977,7 +4684,7 @@ class WM_OT_Pick_Change_Icon_Path(Operator):
 
     def invoke(self, context, event):
         global PICK_EDIT_LIST
-        brushes_in_cat = get_popup_add_list()
+        brushes_in_cat = get_popup_add_list(name_matches=True)
         self.brushes = [b for b in brushes_in_cat if b in PICK_EDIT_LIST]
         if not self.brushes:
             msg = "Brush Manager: Brushes has not been selected."
@@ -4013,7 +4720,7 @@ class WM_OT_Switch_Custom_Icon(Operator):
     def execute(self, context):
         global PICK_EDIT_LIST
 
-        brushes_in_cat = get_popup_add_list()
+        brushes_in_cat = get_popup_add_list(name_matches=True)
         brushes = [b for b in brushes_in_cat if b in PICK_EDIT_LIST]
         if not brushes:
             msg = "Brush Manager: Brushes has not been selected."
@@ -4043,7 +4750,7 @@ class WM_OT_Switch_Fake_User(Operator):
     def execute(self, context):
         global PICK_EDIT_LIST
 
-        brushes_in_cat = get_popup_add_list()
+        brushes_in_cat = get_popup_add_list(name_matches=True)
         brushes = [b for b in brushes_in_cat if b in PICK_EDIT_LIST]
         if not brushes:
             msg = "Brush Manager: Brushes has not been selected."
@@ -4075,7 +4782,7 @@ class WM_OT_Pick_Save_Brushes(Operator):
 
     def __init__(self):
         global PICK_EDIT_LIST
-        brushes_in_cat = get_popup_add_list()
+        brushes_in_cat = get_popup_add_list(name_matches=True)
         self.brushes = [b for b in brushes_in_cat if b in PICK_EDIT_LIST]
 
     def execute(self, context):
@@ -4124,6 +4831,7 @@ class POPUP_OT_Edit_Category_Brushes_Popup(Operator):
         PICK_EDIT_LIST.clear()
         update_brush_list(self, context)
         brushes_enum = preview_brushes_in_folders(self, context)
+        append_lazy_brushes(get_brushes_from_preview_enums(brushes_enum))
         set_brushes_in_category_list_popup(brushes_enum, exclude_fav=False)
         return context.window_manager.invoke_popup(self, width=355)
 
@@ -4134,7 +4842,7 @@ class POPUP_OT_Edit_Category_Brushes_Popup(Operator):
         modes = BM_Modes()
         popup_items_scale = modes.popup_items_scale()
 
-        brushes = get_popup_add_list(list_type='icons_n_brushes')
+        brushes = get_popup_add_list(list_type='icons_n_brushes', name_matches=True)
 
         layout = self.layout
 
@@ -4206,28 +4914,46 @@ class WM_OT_Remove_from_Favorites(Operator):
 
 def set_brushes_in_category_list_popup(brushes_enum, exclude_fav=True):
     full = []
-    fav_list = get_favorite_brushes()
+    fav_list = set(get_favorite_brushes())
     for name1, name2, blank, iconid, index in brushes_enum:
         if name2 in fav_list and exclude_fav:
             continue
         full.append((name1, name2, '', iconid, index))
     global BRUSHES_IN_CATEGORY
     BRUSHES_IN_CATEGORY = full
+    update_popup_search()
+
+
+def remove_brushes_in_category_list_popup(brushes):
+    global BRUSHES_IN_CATEGORY
+    brushes = set(brushes)
+    BRUSHES_IN_CATEGORY = [item for item in BRUSHES_IN_CATEGORY if item[0] not in brushes]
+    update_popup_search()
+
+
+# Icons of the brushes in the popup list by name
+_popup_icons = {}
+
+
+def update_popup_search():
+    _popup_icons.clear()
+    _popup_icons.update((item[0], item[3]) for item in BRUSHES_IN_CATEGORY)
+    popup_search.update(list(_popup_icons), get_brush_search_metadata, LAZY_BRUSHES_VERSION)
+
 
+def get_popup_add_list(list_type='', name_matches=False):
+    """Return the brushes of the popup list which match the search bar.
 
-def get_popup_add_list(list_type=''):
+    With name_matches only the brushes whose names contain the search are
+    returned, the operators which act on the whole list use them.
+    """
     props = bpy.context.window_manager.brush_manager_props
+    filter_name = str(props.search_bar.decode("utf-8"))
     add = []
     icons = []
     icons_n_brushes = []
-    filter_name = str(props.search_bar.decode("utf-8"))
-    for name1, name2, blank, iconid, index in BRUSHES_IN_CATEGORY:
-        if filter_name and not props.search_case_sensitive:
-            if not text_lookup(filter_name.lower(), name1.lower()):
-                continue
-        elif filter_name:
-            if not text_lookup(filter_name, name1):
-                continue
+    for name1 in popup_search.search(filter_name, props.search_case_sensitive, name_matches):
+        iconid = _popup_icons[name1]
         icons.append(iconid)
         add.append(name1)
         icons_n_brushes.append((name1, iconid))
@@ -4239,18 +4965,13 @@ def get_popup_add_list(list_type=''):
 
 
 def add_to_fav_update(self, context, all_the_rest=False):
-    global BRUSHES_IN_CATEGORY
     b_preview_coll = get_preview_brushes_collection(coll_type='favorites')
     brushes_list = get_favorite_brushes()
     if not all_the_rest:
         append_brushes = [self.brush_name]
     else:
-        append_brushes = get_popup_add_list()
-    BRUSHES_IN_CATEGORY = [
-        (n1, n2, b, iid, i)
-        for n1, n2, b, iid, i in BRUSHES_IN_CATEGORY
-        if n1 not in append_brushes
-    ]
+        append_brushes = get_popup_add_list(name_matches=True)
+    remove_brushes_in_category_list_popup(append_brushes)
     brushes_list += append_brushes
     brushes_list.sort()
     create_preview_collection_list(context, brushes_list, b_preview_coll)
@@ -4277,6 +4998,7 @@ class POPUP_OT_Add_to_Favorites_Popup(Operator):
         update_brush_list(self, context)
         brushes_enum = preview_brushes_in_folders(self, context)
         set_brushes_in_category_list_popup(brushes_enum)
+        prioritize_preview_icons(get_popup_add_list(), get_preview_brushes_collection())
         return context.window_manager.invoke_popup(self, width=350)
 
     def draw(self, context):
@@ -4513,6 +5235,10 @@ class T3DN_OT_bip_install_pillow(Operator, InstallPillow):
     bl_idname = 'bm.t3dn_bip_install_pillow'
 
 
+class T3DN_OT_bip_purge_cache(Operator, PurgeCache):
+    bl_idname = 'bm.t3dn_bip_purge_cache'
+
+
 class PREF_OT_Uninstall_pillow(Operator):
     bl_label = 'Uninstall Pillow'
     bl_idname = 'bm.uninstall_pillow'
@@ -4538,6 +5264,7 @@ classes = (
     WM_OT_Delete_Zero_User_Brushes,
     WM_OT_Delete_Active_Brush_Data,
     WM_OT_Refresh_Category_List,
+    WM_OT_Compile_Icon_Themes,
     WM_OT_Save_Favorites,
     WM_OT_Save_Brushes_to_Category,
     WM_OT_Save_Favorites_to_current_file,
@@ -4584,6 +5311,7 @@ classes = (
     WM_MT_Edit_from_Category_Ops,
     WM_OT_Copy_to_Clipboard,
     T3DN_OT_bip_install_pillow,
+    T3DN_OT_bip_purge_cache,
     PREF_OT_Uninstall_pillow,
 )
 
@@ -4651,35 +5379,49 @@ def pre_template_keymaps_save():
     keymaps_state.update(get_current_keymaps())
 
 
+preview_store = None
+t3dn_preview_store = None
 t3dn_brush_coll = None
 t3dn_brush_fav_coll = None
+# The regions which show the brush previews (side panels, tool settings, preferences)
+PREVIEW_REDRAW_REGIONS = {
+    ('VIEW_3D', 'UI'),
+    ('VIEW_3D', 'HEADER'),
+    ('VIEW_3D', 'TOOL_HEADER'),
+    ('IMAGE_EDITOR', 'UI'),
+    ('IMAGE_EDITOR', 'HEADER'),
+    ('IMAGE_EDITOR', 'TOOL_HEADER'),
+    ('PREFERENCES', 'WINDOW'),
+}
 
 
 def register():
-    brushes_coll = bpy.utils.previews.new()
-    brushes_coll.my_previews_dir = ""
-    brushes_coll.my_previews = ()
+    # The lists share the previews of a store, an icon which is in several lists is loaded once
+    global preview_store, t3dn_preview_store
+    preview_store = PreviewStore(bpy.utils.previews.new())
+    brushes_coll, brush_favorites, brush_undo, brush_undof = preview_store.lists(4)
     preview_brushes_coll["main"] = brushes_coll
-    brush_favorites = bpy.utils.previews.new()
     brush_favorites.my_previews_dir = "favorites"
-    brush_favorites.my_previews = ()
     preview_brushes_coll["favorites"] = brush_favorites
-    brush_undo = bpy.utils.previews.new()
     brush_undo.my_previews_dir = "undo"
-    brush_undo.my_previews = ()
     preview_brushes_coll["undo"] = brush_undo
-    brush_undof = bpy.utils.previews.new()
     brush_undof.my_previews_dir = "undo"
-    brush_undof.my_previews = ()
     preview_brushes_coll["undofav"] = brush_undof
 
     global t3dn_brush_coll, t3dn_brush_fav_coll
-    t3dn_brush_coll = previews.new()
-    t3dn_brush_fav_coll = previews.new()
+    t3dn_preview_store = PreviewStore(previews.new(redraw_regions=PREVIEW_REDRAW_REGIONS))
+    t3dn_brush_coll, t3dn_brush_fav_coll = t3dn_preview_store.lists(2)
 
     from bpy.utils import register_class
     for cls in classes:
         register_class(cls)
+    bip_settings.MAX_THREADS = prefs().preview_threads
+    bip_settings.DECODE_PROCESSES = prefs().preview_decode_processes
+    bip_settings.USE_NUMPY = prefs().preview_use_numpy
+    bip_settings.FORMATS_CACHE_FILE = get_pillow_formats_file()
+    subscribe_brush_index()
+    clear_pref_default_brushes()
+    update_preview_cache_size(prefs(), bpy.context)
 
     wm = bpy.types.WindowManager
     wm.brush_manager_props = PointerProperty(type=BrushManager_Properties)
@@ -4707,6 +5449,7 @@ def register():
     set_brushes_data_collection_items()
     update_panel(None, bpy.context)
     register_keymaps()
+    bpy.app.timers.register(start_libraries_scan, first_interval=1.0)
 
 
 def unregister():
@@ -4717,12 +5460,19 @@ def unregister():
     for cls in classes:
         unregister_class(cls)
 
-    for bcoll in preview_brushes_coll.values():
-        bpy.utils.previews.remove(bcoll)
     preview_brushes_coll.clear()
-
-    previews.remove(t3dn_brush_coll)
-    previews.remove(t3dn_brush_fav_coll)
+    bpy.utils.previews.remove(preview_store.collection)
+    previews.remove(t3dn_preview_store.collection)
+    previews.shutdown()
+    close_icon_atlases()
+    clear_pref_default_brushes()
+    bpy.msgbus.clear_by_owner(brush_index)
+
+    for timer in (start_libraries_scan, library_scan_timer):
+        if bpy.app.timers.is_registered(timer):
+            bpy.app.timers.unregister(timer)
+    scanner.shutdown()
+    save_library_indexes()
 
     try:
         bpy.app.handlers.load_post.remove(brush_manager_on_file_load)
@@ -0,0 +1,86 @@
+'''Compare the thread and the process decode backends of t3dn_bip.
+
+Decodes the PNG icons of the bundled icon themes with the same number of
+loading threads, once decoding in the threads and once in a decode process
+per thread. Needs Pillow, runs without Blender:
+
+    python benchmarks/decode_backends.py [--threads 4] [--rounds 3]
+'''
+
+import os
+import sys
+import argparse
+from time import perf_counter
+from threading import Barrier
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from t3dn_bip import utils, processes  # noqa: E402
+
+
+def icon_files():
+    files = []
+    for folder in ('icon_themes', 'paint_icons', 'gpaint_icons', 'wpaint_icons', 'vpaint_icons'):
+        for dirpath, dirnames, filenames in os.walk(os.path.join(ROOT, folder)):
+            files += [os.path.join(dirpath, fn) for fn in filenames if fn.lower().endswith('.png')]
+    return sorted(files)
+
+
+def decode_in_thread(filepath):
+    return utils.load_file(filepath, (128, 128))
+
+
+def decode_in_process(filepath):
+    data = processes.load_file(filepath, (128, 128))
+    data.get('release', lambda: None)()
+    return data
+
+
+def warm_up(executor, files, threads):
+    '''Start the decode process of every thread of the executor.'''
+    barrier = Barrier(threads)
+
+    def start(filepath):
+        decode_in_process(filepath)
+        barrier.wait()
+
+    list(executor.map(start, files[:1] * threads))
+
+
+def run(executor, decode, files):
+    start = perf_counter()
+    list(executor.map(decode, files))
+    return perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    if not utils.support_pillow():
+        print('Pillow is not installed, PNG icons can not be decoded.')
+        return 1
+
+    files = icon_files()
+    print(f'{len(files)} icons, {args.threads} threads, best of {args.rounds} rounds')
+
+    # The same threads, and so the same decode processes, are used for every round.
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        try:
+            warm_up(executor, files, args.threads)
+
+            for name, decode in (('threads', decode_in_thread), ('processes', decode_in_process)):
+                best = min(run(executor, decode, files) for _ in range(args.rounds))
+                print(f'{name:>10}: {best * 1000:8.1f} ms, {len(files) / best:8.1f} icons/s')
+        finally:
+            processes.shutdown()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
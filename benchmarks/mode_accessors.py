@@ -0,0 +1,172 @@
+'''Compare the per-call mode settings of Brush Manager with the mode registry.
+
+Before the registry every BM_Modes() rebuilt the settings of all modes and
+its accessors ran eval('prefs.' + name). Brush_Manager.py needs Blender, so
+both ways are rebuilt here over plain objects: the old one with the same
+dictionaries and eval, the new one with the prebuilt descriptors and
+attrgetter. A draw of the tools and brushes popup is modelled as a number
+of BM_Modes() instances, preference reads and a brush_use_mode check per
+brush. Runs without Blender:
+
+    python benchmarks/mode_accessors.py [--draws 2000] [--modes 8] [--prefs 8] [--brushes 200]
+'''
+
+import sys
+import argparse
+from time import perf_counter
+from operator import attrgetter
+from types import MappingProxyType, SimpleNamespace
+
+PREFIXES = {
+    'SCULPT': 's',
+    'PAINT_TEXTURE': 'ip',
+    'PAINT_WEIGHT': 'wp',
+    'PAINT_VERTEX': 'vp',
+    'PAINT_GPENCIL': 'gp',
+    'VERTEX_GPENCIL': 'gv',
+}
+
+BRUSH_USE_MODE = {
+    'SCULPT': 'use_paint_sculpt',
+    'PAINT_TEXTURE': 'use_paint_image',
+    'PAINT_WEIGHT': 'use_paint_weight',
+    'PAINT_VERTEX': 'use_paint_vertex',
+    'PAINT_GPENCIL': 'use_paint_grease_pencil',
+    'VERTEX_GPENCIL': 'use_vertex_grease_pencil',
+}
+
+POPUP_PREFS = ('popup_items_scale', 'preview_frame_scale', 'wide_popup_layout', 'popup_width')
+
+
+def mode_props(mode):
+    m = PREFIXES[mode]
+    return {
+        'tool_settings': mode.lower(),
+        'brush_tool': mode.lower() + '_tool',
+        'brush_use_mode': BRUSH_USE_MODE[mode],
+        'fav_settings': 'bm_' + m + '_favorite_settings',
+        'fav_store': 'bm_' + m + '_fav_list_store',
+        'icons_folder': m + '_icons',
+        'has_themes': mode == 'SCULPT',
+        'def_brushes_tool_list': [],
+        'other_tools_list': [],
+        'def_brush_names': [],
+        'is_split_tools': False,
+        'use_custom_icons': True,
+        'default_custom_icons': 'default_' + m + '_brushes_custom_icon',
+        'pref_brush': 'default_' + m + '_brush_',
+        'pref_tool': m + '_tool_brush_',
+        'pref_other_tool': m + '_tool_',
+        'use_startup_favorites': 'use_' + m + '_startup_favorites',
+        'path_to_startup_favorites': 'path_to_' + m + '_startup_favorites',
+        'brush_library': m + '_brush_library',
+        'wide_popup_layout': 'wide_' + m + '_popup_layout',
+        'wide_popup_layout_size': 'wide_' + m + '_popup_layout_size',
+        'popup_max_tool_columns': 'popup_' + m + '_max_tool_columns',
+        'popup_width': 'popup_' + m + '_width',
+        'preview_frame_scale': 'preview_' + m + '_frame_scale',
+        'popup_items_scale': 'popup_' + m + '_items_scale',
+        'show_def_brushes_in_categories': 'show_' + m + '_def_brushes_in_categories',
+    }
+
+
+class OldModes:
+    '''Rebuilds the settings of all modes, reads them with eval.'''
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.mode_prefixes = dict(PREFIXES)
+        self.Modes = {}
+        for im in PREFIXES:
+            self.Modes[im] = mode_props(im)
+
+    def pref(self, prefs, key):
+        return eval('prefs.' + self.Modes[self.mode].get(key))
+
+    def brush_use_mode(self, brush):
+        return eval('brush.' + self.Modes[self.mode].get('brush_use_mode'))
+
+
+class Descriptor:
+    __slots__ = ('props', 'get_brush_use_mode', 'pref_getters')
+
+    def __init__(self, mode):
+        props = mode_props(mode)
+        self.props = MappingProxyType(props)
+        self.get_brush_use_mode = attrgetter(props['brush_use_mode'])
+        self.pref_getters = MappingProxyType({key: attrgetter(props[key]) for key in POPUP_PREFS})
+
+
+REGISTRY = MappingProxyType({mode: Descriptor(mode) for mode in PREFIXES})
+
+
+class NewModes:
+    '''Keeps the mode, reads the settings from the registry.'''
+    __slots__ = ('mode',)
+
+    def __init__(self, mode):
+        self.mode = mode
+
+    def pref(self, prefs, key):
+        return REGISTRY[self.mode].pref_getters[key](prefs)
+
+    def brush_use_mode(self, brush):
+        return REGISTRY[self.mode].get_brush_use_mode(brush)
+
+
+def make_prefs():
+    values = {}
+    for m in PREFIXES.values():
+        values.update({
+            'popup_' + m + '_items_scale': 1.0,
+            'preview_' + m + '_frame_scale': 1.0,
+            'wide_' + m + '_popup_layout': False,
+            'popup_' + m + '_width': 180,
+        })
+    return SimpleNamespace(**values)
+
+
+def make_brushes(count):
+    return [SimpleNamespace(**{name: i % 2 == 0 for name in BRUSH_USE_MODE.values()}) for i in range(count)]
+
+
+def draw(cls, prefs, brushes, instances, reads):
+    for _ in range(instances):
+        modes = cls('SCULPT')
+    for i in range(reads):
+        modes.pref(prefs, POPUP_PREFS[i % len(POPUP_PREFS)])
+    return [brush for brush in brushes if modes.brush_use_mode(brush)]
+
+
+def run(cls, prefs, brushes, args):
+    start = perf_counter()
+    for _ in range(args.draws):
+        draw(cls, prefs, brushes, args.modes, args.prefs)
+    return perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--draws', type=int, default=2000)
+    parser.add_argument('--modes', type=int, default=8, help='BM_Modes() per draw')
+    parser.add_argument('--prefs', type=int, default=8, help='preference reads per draw')
+    parser.add_argument('--brushes', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    prefs = make_prefs()
+    brushes = make_brushes(args.brushes)
+    print(f'{args.draws} draws, {args.modes} BM_Modes(), {args.prefs} preference reads, '
+          f'{args.brushes} brushes, best of {args.rounds} rounds')
+
+    results = {}
+    for name, cls in (('eval', OldModes), ('registry', NewModes)):
+        results[name] = min(run(cls, prefs, brushes, args) for _ in range(args.rounds))
+        print(f'{name:>9}: {results[name] * 1e6 / args.draws:8.1f} us/draw')
+
+    print(f'{"saved":>9}: {(results["eval"] - results["registry"]) * 1e6 / args.draws:8.1f} us/draw')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+'''Compare the Pillow and the NumPy pixel conversion of t3dn_bip.
+
+Loads the PNG icons of the bundled icon themes one by one with the Pillow
+chain, one by one with NumPy, and in one batch with NumPy, and prints the
+CPU time per icon. Then times the conversion of already decoded icons
+alone, without the PNG decoding both paths share. Needs Pillow and NumPy,
+runs without Blender:
+
+    python benchmarks/pixel_conversion.py [--max-size 128] [--rounds 3]
+'''
+
+import os
+import sys
+import argparse
+from time import process_time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from t3dn_bip import batch, settings, utils  # noqa: E402
+
+
+def icon_files():
+    files = []
+    for folder in ('icon_themes', 'paint_icons', 'gpaint_icons', 'wpaint_icons', 'vpaint_icons'):
+        for dirpath, dirnames, filenames in os.walk(os.path.join(ROOT, folder)):
+            files += [os.path.join(dirpath, fn) for fn in filenames if fn.lower().endswith('.png')]
+    return sorted(files)
+
+
+def load_each(files, max_size):
+    for filepath in files:
+        utils.load_file(filepath, max_size)
+
+
+def load_batch(files, max_size):
+    batch.load_files(files, max_size)
+
+
+def convert_pillow(images, max_size):
+    Image = utils.Image
+    for image in images:
+        image = image.transpose(Image.FLIP_TOP_BOTTOM).convert('RGBa')
+        if utils._should_resize(image.size, max_size):
+            image = utils._resize_image(image, max_size)
+        image.tobytes()
+        if utils._should_resize(image.size, (32, 32)):
+            image.resize(size=(32, 32)).tobytes()
+
+
+def convert_numpy(images, max_size):
+    batch.convert(images, max_size)
+
+
+def run(load, files, max_size, use_numpy):
+    settings.USE_NUMPY = use_numpy
+    start = process_time()
+    load(files, max_size)
+    return process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-size', type=int, default=128)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    if not utils.support_pillow():
+        print('Pillow is not installed, PNG icons can not be decoded.')
+        return 1
+
+    if not batch.support_numpy():
+        print('NumPy is not installed.')
+        return 1
+
+    files = icon_files()
+    max_size = (args.max_size, args.max_size)
+    print(f'{len(files)} icons, max size {args.max_size}, best of {args.rounds} rounds')
+
+    for name, load, use_numpy in (
+        ('pillow', load_each, False),
+        ('numpy', load_each, True),
+        ('numpy batch', load_batch, True),
+    ):
+        best = min(run(load, files, max_size, use_numpy) for _ in range(args.rounds))
+        print(f'{name:>12}: {best * 1000:8.1f} ms, {best * 1e6 / len(files):8.1f} us/icon')
+
+    images = []
+    for filepath in files:
+        with utils.Image.open(filepath) as image:
+            images.append(image.convert('RGBA'))
+
+    print('conversion of decoded icons')
+    for name, convert in (('pillow', convert_pillow), ('numpy batch', convert_numpy)):
+        best = min(run(convert, images, max_size, True) for _ in range(args.rounds))
+        print(f'{name:>12}: {best * 1000:8.1f} ms, {best * 1e6 / len(images):8.1f} us/icon')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
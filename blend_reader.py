@@ -0,0 +1,352 @@
+"""Read brushes from a .blend file without Blender.
+
+Only the file header, the block headers, the SDNA and the brush blocks are
+parsed, so it is safe to use outside of the main thread and out of Blender.
+"""
+
+import gzip
+import zlib
+import struct
+
+
+class BlendFileError(Exception):
+    pass
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+BRUSH_CODE = b'BR\x00\x00'
+SDNA_CODE = b'DNA1'
+END_CODE = b'ENDB'
+
+# Bits of Brush.ob_mode (eObjectMode) for the properties checked by BM_Modes.brush_use_mode
+OB_MODES = {
+    'SCULPT': 1 << 1,  # use_paint_sculpt
+    'PAINT_VERTEX': 1 << 2,  # use_paint_vertex
+    'PAINT_WEIGHT': 1 << 3,  # use_paint_weight
+    'PAINT_TEXTURE': 1 << 4,  # use_paint_image
+    'PAINT_GPENCIL': 1 << 8 | 1 << 13,  # use_paint_grease_pencil
+    'VERTEX_GPENCIL': 1 << 11,  # use_vertex_grease_pencil
+}
+# Names of the tool fields in DNA before and after Blender 4.3
+TOOL_FIELDS = {
+    'SCULPT': ('sculpt_tool', 'sculpt_brush_type'),
+    'PAINT_TEXTURE': ('imagepaint_tool', 'image_brush_type'),
+    'PAINT_WEIGHT': ('weightpaint_tool', 'weight_brush_type'),
+    'PAINT_VERTEX': ('vertexpaint_tool', 'vertex_brush_type'),
+    'PAINT_GPENCIL': ('gpencil_tool', 'gpencil_brush_type'),
+    'VERTEX_GPENCIL': ('gpencil_vertex_tool', 'gpencil_vertex_brush_type'),
+}
+# Tool enum values and their RNA identifiers
+TOOL_ITEMS = {
+    'SCULPT': {
+        1: 'DRAW', 2: 'SMOOTH', 3: 'PINCH', 4: 'INFLATE', 5: 'GRAB',
+        6: 'LAYER', 7: 'FLATTEN', 8: 'CLAY', 9: 'FILL', 10: 'SCRAPE',
+        11: 'NUDGE', 12: 'THUMB', 13: 'SNAKE_HOOK', 14: 'ROTATE', 15: 'SIMPLIFY',
+        16: 'CREASE', 17: 'BLOB', 18: 'CLAY_STRIPS', 19: 'MASK', 20: 'DRAW_SHARP',
+        21: 'ELASTIC_DEFORM', 22: 'POSE', 23: 'MULTIPLANE_SCRAPE', 24: 'SLIDE_RELAX',
+        25: 'CLAY_THUMB', 26: 'CLOTH', 27: 'DRAW_FACE_SETS', 28: 'PAINT', 29: 'SMEAR',
+        30: 'BOUNDARY', 31: 'DISPLACEMENT_ERASER', 32: 'DISPLACEMENT_SMEAR',
+    },
+    'PAINT_TEXTURE': {0: 'DRAW', 1: 'SOFTEN', 2: 'SMEAR', 3: 'CLONE', 4: 'FILL', 5: 'MASK'},
+    'PAINT_WEIGHT': {0: 'DRAW', 1: 'BLUR', 2: 'AVERAGE', 3: 'SMEAR'},
+    'PAINT_VERTEX': {0: 'DRAW', 1: 'BLUR', 2: 'AVERAGE', 3: 'SMEAR'},
+    'PAINT_GPENCIL': {0: 'DRAW', 1: 'FILL', 2: 'ERASE', 3: 'TINT'},
+    'VERTEX_GPENCIL': {0: 'DRAW', 1: 'BLUR', 2: 'AVERAGE', 3: 'TINT', 4: 'SMEAR', 5: 'REPLACE'},
+}
+
+# eBrushFlags bit of Brush.flag for use_custom_icon
+BRUSH_CUSTOM_ICON = 1 << 28
+
+INT_FORMATS = {1: 'B', 2: 'h', 4: 'i', 8: 'q'}
+
+
+class CompressedFile:
+    """Decompressing stream of a .blend file which closes the file with it.
+
+    Errors of the decompressor, like a truncated file, raise BlendFileError.
+    """
+
+    def __init__(self, stream, file, errors=()):
+        self.stream = stream
+        self.file = file
+        self.errors = (EOFError, zlib.error) + tuple(errors)
+
+    def read(self, size=-1):
+        try:
+            return self.stream.read(size)
+        except self.errors as e:
+            raise BlendFileError(f'invalid compressed data: {e}')
+
+    def seek(self, offset, whence=0):
+        try:
+            return self.stream.seek(offset, whence)
+        except self.errors as e:
+            raise BlendFileError(f'invalid compressed data: {e}')
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def open_blend_file(filepath):
+    """Open a .blend file for reading, compressed files are decompressed on the fly
+    """
+    file = open(filepath, 'rb')
+    magic = file.read(4)
+    file.seek(0)
+    if magic.startswith(GZIP_MAGIC):
+        return CompressedFile(gzip.GzipFile(fileobj=file, mode='rb'), file)
+    if magic == ZSTD_MAGIC:
+        try:
+            from compression import zstd
+        except ImportError:
+            zstd = None
+        if zstd is not None:
+            return CompressedFile(zstd.ZstdFile(file, mode='rb'), file, (zstd.ZstdError,))
+        try:
+            import zstandard
+        except ImportError:
+            file.close()
+            raise BlendFileError('zstd compressed files are not supported')
+        return CompressedFile(
+            zstandard.ZstdDecompressor().stream_reader(file, closefd=True), file, (zstandard.ZstdError,))
+    return file
+
+
+class FileHeader:
+    def __init__(self, data):
+        if not data.startswith(b'BLENDER'):
+            raise BlendFileError('not a blend file')
+        if data[7:9].isdigit():
+            # Since Blender 5.0: BLENDER17-01v0500
+            self.size = int(data[7:9])
+            self.pointer_size = 8
+            self.endian = '<' if data[12:13] == b'v' else '>'
+            self.bhead_version = int(data[10:12])
+            self.version = int(data[13:17])
+        else:
+            # BLENDER-v402
+            self.size = 12
+            self.pointer_size = 8 if data[7:8] == b'-' else 4
+            self.endian = '<' if data[8:9] == b'v' else '>'
+            self.bhead_version = 0
+            self.version = int(data[9:12])
+        if self.bhead_version:
+            # code, SDNAnr, old, len, nr
+            self.bhead = struct.Struct(self.endian + '4siQqq')
+        elif self.pointer_size == 8:
+            # code, len, old, SDNAnr, nr
+            self.bhead = struct.Struct(self.endian + '4siQii')
+        else:
+            self.bhead = struct.Struct(self.endian + '4siIii')
+
+    def block_length(self, values):
+        if self.bhead_version:
+            return values[3]
+        return values[1]
+
+
+class SDNA:
+    def __init__(self, data, header):
+        self.header = header
+        endian = header.endian
+        offset = 0
+
+        def read_int():
+            nonlocal offset
+            value = struct.unpack_from(endian + 'i', data, offset)[0]
+            offset += 4
+            return value
+
+        def read_strings(count):
+            nonlocal offset
+            strings = []
+            for i in range(count):
+                end = data.index(b'\x00', offset)
+                strings.append(data[offset:end].decode('utf-8', 'replace'))
+                offset = end + 1
+            return strings
+
+        def align():
+            nonlocal offset
+            offset = (offset + 3) & ~3
+
+        def expect(code):
+            nonlocal offset
+            if data[offset:offset + 4] != code:
+                raise BlendFileError('unexpected SDNA layout')
+            offset += 4
+
+        expect(b'SDNA')
+        expect(b'NAME')
+        names = read_strings(read_int())
+        align()
+        expect(b'TYPE')
+        types = read_strings(read_int())
+        align()
+        expect(b'TLEN')
+        lengths = struct.unpack_from(endian + str(len(types)) + 'h', data, offset)
+        offset += 2 * len(types)
+        align()
+        expect(b'STRC')
+        self.type_lengths = dict(zip(types, lengths))
+        self.structs = {}
+        for i in range(read_int()):
+            type_index, count = struct.unpack_from(endian + 'hh', data, offset)
+            offset += 4
+            fields = {}
+            field_offset = 0
+            for f in range(count):
+                f_type, f_name = struct.unpack_from(endian + 'hh', data, offset)
+                offset += 4
+                name, size, array = self.field_size(types[f_type], names[f_name])
+                fields[name] = (types[f_type], field_offset, size, array)
+                field_offset += size
+            self.structs[types[type_index]] = fields
+
+    def field_size(self, type_name, name):
+        is_pointer = name.startswith('*') or name.startswith('(*')
+        array = 1
+        for dim in name.split('[')[1:]:
+            array *= int(dim.split(']')[0])
+        if is_pointer:
+            size = self.header.pointer_size
+        else:
+            size = self.type_lengths[type_name]
+        clean_name = name.split('[')[0].strip('*()')
+        return clean_name, size * array, array
+
+    def find_field(self, struct_name, *path):
+        """Return type, offset, size and array length of the field at the path
+        """
+        offset = 0
+        for name in path:
+            fields = self.structs.get(struct_name)
+            if fields is None or name not in fields:
+                return None
+            struct_name, field_offset, size, array = fields[name]
+            offset += field_offset
+        return struct_name, offset, size, array
+
+
+def read_int_field(sdna, data, field):
+    if field is None:
+        return None
+    f_type, offset, size, array = field
+    size = size // array
+    fmt = INT_FORMATS.get(size)
+    if fmt is None or offset + size > len(data):
+        return None
+    return struct.unpack_from(sdna.header.endian + fmt, data, offset)[0]
+
+
+def read_string_field(data, field):
+    if field is None:
+        return ''
+    f_type, offset, size, array = field
+    value = data[offset:offset + size]
+    return value.split(b'\x00', 1)[0].decode('utf-8', 'replace')
+
+
+def read_blocks(file, codes):
+    """Return the file header, the SDNA block data and the data blocks of the given codes
+    """
+    data = file.read(17)
+    header = FileHeader(data)
+    leftover = data[header.size:]
+    blocks = []
+    sdna_data = None
+    while True:
+        bhead_data = leftover + file.read(header.bhead.size - len(leftover))
+        leftover = b''
+        if len(bhead_data) < header.bhead.size:
+            break
+        values = header.bhead.unpack(bhead_data)
+        code = values[0]
+        if code == END_CODE:
+            break
+        length = header.block_length(values)
+        if code in codes:
+            blocks.append((code, values, file.read(length)))
+        elif code == SDNA_CODE:
+            sdna_data = file.read(length)
+        else:
+            skip_bytes(file, length)
+    if sdna_data is None:
+        raise BlendFileError('the file has no SDNA')
+    return header, sdna_data, blocks
+
+
+def skip_bytes(file, length):
+    try:
+        file.seek(length, 1)
+    except (OSError, ValueError):
+        while length > 0:
+            chunk = file.read(min(length, 1 << 20))
+            if not chunk:
+                break
+            length -= len(chunk)
+
+
+def read_brushes(filepath):
+    """Return a dict of brush names with their modes, tools and custom icons in the file
+    """
+    with open_blend_file(filepath) as file:
+        try:
+            header, sdna_data, blocks = read_blocks(file, {BRUSH_CODE})
+        except (struct.error, ValueError, IndexError) as e:
+            raise BlendFileError(str(e))
+    try:
+        sdna = SDNA(sdna_data, header)
+    except (struct.error, ValueError, IndexError, KeyError) as e:
+        raise BlendFileError(str(e))
+
+    name_field = sdna.find_field('Brush', 'id', 'name')
+    if name_field is None:
+        raise BlendFileError('the file has no brush name in SDNA')
+    mode_field = sdna.find_field('Brush', 'ob_mode')
+    flag_field = sdna.find_field('Brush', 'flag')
+    icon_field = sdna.find_field('Brush', 'icon_filepath')
+    tool_fields = {}
+    for mode, names in TOOL_FIELDS.items():
+        for name in names:
+            field = sdna.find_field('Brush', name)
+            if field is not None:
+                tool_fields[mode] = field
+                break
+
+    brushes = {}
+    for code, values, data in blocks:
+        # Skip the 'BR' ID code prefix of the name
+        name = read_string_field(data, name_field)[2:]
+        if not name:
+            continue
+        ob_mode = read_int_field(sdna, data, mode_field) or 0
+        modes = []
+        tools = {}
+        for mode, bits in OB_MODES.items():
+            if not ob_mode & bits:
+                continue
+            modes.append(mode)
+            tool = read_int_field(sdna, data, tool_fields.get(mode))
+            if tool is not None:
+                tools[mode] = TOOL_ITEMS[mode].get(tool, str(tool))
+        flag = read_int_field(sdna, data, flag_field) or 0
+        brushes[name] = {
+            'modes': modes,
+            'tools': tools,
+            'use_custom_icon': bool(flag & BRUSH_CUSTOM_ICON),
+            # Relative paths are relative to the directory of the file
+            'icon_filepath': read_string_field(data, icon_field),
+        }
+    return brushes
@@ -0,0 +1,73 @@
+from bisect import bisect_left, insort
+
+from .library_index import MODE_FLAGS, MODE_TOOLS, brush_info
+
+
+# Brush properties which change an index entry
+INDEXED_PROPERTIES = ('name', 'use_custom_icon') + tuple(MODE_FLAGS.values()) + tuple(MODE_TOOLS.values())
+
+
+class BrushIndex:
+    """Brushes of the current file by mode, instead of scanning bpy.data.brushes for every list.
+
+    An entry keeps the mode flags, the tool types and the custom icon state
+    of a brush. The entries are updated by the add-on where it adds, removes
+    or renames brushes, and rebuilt when the index is marked stale, which the
+    message bus subscriptions and the file handlers do, or when the number
+    of brushes changed behind its back.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self._names = {}
+        self._stale = True
+
+    def mark_stale(self, *args):
+        self._stale = True
+
+    def _insert(self, name, brush):
+        info = brush_info(brush)
+        self.entries[name] = info
+        for mode in info['modes']:
+            insort(self._names.setdefault(mode, []), name)
+
+    def _build(self, brushes):
+        self.entries.clear()
+        self._names.clear()
+        for brush in brushes:
+            self._insert(brush.name, brush)
+        self._stale = False
+
+    def ensure(self, brushes):
+        if self._stale or len(brushes) != len(self.entries):
+            self._build(brushes)
+
+    def update(self, brush):
+        if self._stale:
+            return None
+        self.remove(brush.name)
+        self._insert(brush.name, brush)
+
+    def rename(self, old_name, brush):
+        self.remove(old_name)
+        self.update(brush)
+
+    def remove(self, name):
+        info = self.entries.pop(name, None)
+        if info is None:
+            return None
+        for mode in info['modes']:
+            names = self._names[mode]
+            index = bisect_left(names, name)
+            if index < len(names) and names[index] == name:
+                del names[index]
+
+    def names(self, brushes, mode):
+        """Sorted names of the brushes used in the mode
+        """
+        self.ensure(brushes)
+        return list(self._names.get(mode, ()))
+
+    def get(self, brushes, name):
+        self.ensure(brushes)
+        return self.entries.get(name)
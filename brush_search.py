@@ -0,0 +1,237 @@
+import os
+from bisect import bisect_left
+from collections import OrderedDict
+
+
+# Length of the n-grams of the index, shorter queries use the 1 and 2-grams
+GRAM_SIZE = 3
+
+# Part of the query n-grams a name needs to be a fuzzy match
+FUZZY_MIN_SHARED = 0.5
+
+RESULTS_CACHE_SIZE = 32
+
+# Ranks of the matches, lower is better
+MATCH_EXACT = 0
+MATCH_PREFIX = 1
+MATCH_WORD_PREFIX = 2
+MATCH_SUBSTRING = 3
+MATCH_METADATA = 4
+MATCH_FUZZY = 5
+
+
+def ngrams(text, size):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def name_grams(text):
+    grams = set()
+    for size in range(1, GRAM_SIZE + 1):
+        grams |= ngrams(text, size)
+    return grams
+
+
+def query_grams(query):
+    return ngrams(query, min(len(query), GRAM_SIZE))
+
+
+def words(text):
+    return text.replace('_', ' ').replace('-', ' ').replace('.', ' ').split()
+
+
+def brush_metadata(filepath=''):
+    """Search words of the library file of a brush
+    """
+    filename = os.path.splitext(os.path.basename(filepath))[0]
+    return tuple(words(filename.casefold()))
+
+
+class RecentBrushes:
+    """Order in which brushes have been selected, newer uses rank higher in the search
+    """
+
+    def __init__(self):
+        self._uses = {}
+        self.clock = 0
+
+    def use(self, name):
+        self.clock += 1
+        self._uses[name] = self.clock
+
+    def last_use(self, name):
+        return self._uses.get(name, 0)
+
+
+class BrushSearch:
+    """Search index of the brush names of a list and of their library files.
+
+    Names are case folded once when they are added and their 1, 2 and 3-grams
+    point to them, so a query only visits the names which share its rarest
+    n-gram instead of the whole list. Names which contain the query rank by
+    where it is found, then names whose metadata words start with it, then
+    names which share most of its 3-grams. Ties rank by recent use.
+    """
+
+    def __init__(self, recent=None):
+        self.recent = recent or RecentBrushes()
+        self._names = []
+        self._key = None
+        self._folded = {}
+        self._grams = {}
+        self._metadata = {}
+        self._words = []
+        self._word_names = {}
+        self._results = OrderedDict()
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._folded
+
+    def _add(self, name, metadata):
+        folded = name.casefold()
+        self._folded[name] = folded
+        for gram in name_grams(folded):
+            self._grams.setdefault(gram, set()).add(name)
+        self._metadata[name] = metadata
+        for word in metadata:
+            self._word_names.setdefault(word, set()).add(name)
+
+    def _remove(self, name):
+        folded = self._folded.pop(name)
+        for gram in name_grams(folded):
+            names = self._grams[gram]
+            names.discard(name)
+            if not names:
+                del self._grams[gram]
+        for word in self._metadata.pop(name):
+            names = self._word_names[word]
+            names.discard(name)
+            if not names:
+                del self._word_names[word]
+
+    def update(self, names, metadata=None, key=None):
+        """Index the names in their order, metadata(name) returns the words of a name,
+        see brush_metadata.
+
+        Nothing is done if the names and the key, the list they come from,
+        are the same as before. Otherwise the metadata of every name is read
+        again, and only the names which are new, left the list or have other
+        metadata are indexed again.
+        """
+        if names == self._names and key == self._key:
+            return None
+        new_names = set(names)
+        for name in [n for n in self._folded if n not in new_names]:
+            self._remove(name)
+        for name in names:
+            words = metadata(name) if metadata else ()
+            if name in self._folded:
+                if self._metadata[name] == words:
+                    continue
+                self._remove(name)
+            self._add(name, words)
+        self._names = list(names)
+        self._key = key
+        self._words = sorted(self._word_names)
+        self._results.clear()
+
+    def remove(self, names):
+        names = [n for n in names if n in self._folded]
+        if not names:
+            return None
+        for name in names:
+            self._remove(name)
+        removed = set(names)
+        self._names = [n for n in self._names if n not in removed]
+        self._words = sorted(self._word_names)
+        self._results.clear()
+
+    def clear(self):
+        self.update([])
+        self._results.clear()
+
+    def _candidates(self, grams):
+        postings = [self._grams.get(gram, ()) for gram in grams]
+        postings.sort(key=len)
+        if not postings or not postings[0]:
+            return set()
+        candidates = set(postings[0])
+        for names in postings[1:]:
+            candidates.intersection_update(names)
+            if not candidates:
+                break
+        return candidates
+
+    def _metadata_matches(self, query):
+        names = set()
+        index = bisect_left(self._words, query)
+        while index < len(self._words) and self._words[index].startswith(query):
+            names |= self._word_names[self._words[index]]
+            index += 1
+        return names
+
+    def _fuzzy_matches(self, grams):
+        votes = {}
+        for gram in grams:
+            for name in self._grams.get(gram, ()):
+                votes[name] = votes.get(name, 0) + 1
+        min_votes = max(2, len(grams) * FUZZY_MIN_SHARED)
+        return {name: count / len(grams) for name, count in votes.items() if count >= min_votes}
+
+    def _rank(self, name, query, position):
+        folded = self._folded[name]
+        if folded == query:
+            return MATCH_EXACT
+        if position == 0:
+            return MATCH_PREFIX
+        if not folded[position - 1].isalnum():
+            return MATCH_WORD_PREFIX
+        return MATCH_SUBSTRING
+
+    def _search(self, query, case_sensitive, name_matches):
+        folded_query = query.casefold()
+        ranked = []
+        found = set()
+        for name in self._candidates(query_grams(folded_query)):
+            if case_sensitive:
+                position = name.find(query)
+            else:
+                position = self._folded[name].find(folded_query)
+            if position == -1:
+                continue
+            found.add(name)
+            ranked.append(((self._rank(name, folded_query, position), position), name))
+
+        if not case_sensitive and not name_matches:
+            for name in self._metadata_matches(folded_query) - found:
+                found.add(name)
+                ranked.append(((MATCH_METADATA, 0), name))
+            if len(folded_query) > GRAM_SIZE:
+                fuzzy = self._fuzzy_matches(ngrams(folded_query, GRAM_SIZE))
+                for name, shared in fuzzy.items():
+                    if name not in found:
+                        ranked.append(((MATCH_FUZZY, -shared), name))
+
+        last_use = self.recent.last_use
+        ranked.sort(key=lambda item: (item[0], -last_use(item[1]), self._folded[item[1]]))
+        return [name for key, name in ranked]
+
+    def search(self, query, case_sensitive=False, name_matches=False):
+        """Return the names which match the query, best first, all names in their order if it is empty.
+
+        With name_matches only the names which contain the query are returned,
+        without metadata and fuzzy matches.
+        """
+        if not query:
+            return list(self._names)
+        key = (query, case_sensitive, name_matches, self.recent.clock)
+        results = self._results.get(key)
+        if results is None:
+            results = self._results[key] = self._search(query, case_sensitive, name_matches)
+            while len(self._results) > RESULTS_CACHE_SIZE:
+                self._results.popitem(last=False)
+        else:
+            self._results.move_to_end(key)
+        return list(results)
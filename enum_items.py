@@ -0,0 +1,36 @@
+def update_enum_items(items, names, make_item):
+    """Return the preview enum items of the names and the names which are no longer in them.
+
+    An item is (name, name, description, icon_id, number). The items of the
+    names which are already in items are kept as they are, with their icon
+    and number, so only the new names cost icon work. make_item(name, number)
+    makes the item of a new name, it may return None to leave the name out.
+    New items get numbers above the existing ones, so the stored value of
+    the enum property keeps pointing at the same brush.
+
+    The given items are not changed, they may be kept elsewhere, by the undo
+    lists for example.
+    """
+    old_items = {item[0]: item for item in items}
+    number = max((item[4] for item in items), default=-1) + 1
+    new_items = []
+    for name in names:
+        item = old_items.pop(name, None)
+        if item is None:
+            item = make_item(name, number)
+            if item is None:
+                continue
+            number += 1
+        new_items.append(item)
+    return new_items, list(old_items)
+
+
+def rename_enum_item(items, old_name, new_name):
+    """Return the items with the item of old_name renamed, it keeps its icon and number
+    """
+    new_items = []
+    for item in items:
+        if item[0] == old_name:
+            item = (new_name, new_name) + tuple(item[2:])
+        new_items.append(item)
+    return new_items
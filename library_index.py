@@ -0,0 +1,187 @@
+import os
+import json
+from threading import RLock
+
+
+INDEX_FILE_NAME = '.brush_manager_index.json'
+INDEX_VERSION = 3
+
+# Brush attributes that tell in which mode a brush is used,
+# the same as 'brush_use_mode' of the BM_Modes
+MODE_FLAGS = {
+    'SCULPT': 'use_paint_sculpt',
+    'PAINT_TEXTURE': 'use_paint_image',
+    'PAINT_WEIGHT': 'use_paint_weight',
+    'PAINT_VERTEX': 'use_paint_vertex',
+    'PAINT_GPENCIL': 'use_paint_grease_pencil',
+    'VERTEX_GPENCIL': 'use_vertex_grease_pencil',
+}
+# Brush attributes with the tool type of the brush in that mode,
+# the same as 'brush_tool' of the BM_Modes
+MODE_TOOLS = {
+    'SCULPT': 'sculpt_tool',
+    'PAINT_TEXTURE': 'image_tool',
+    'PAINT_WEIGHT': 'weight_tool',
+    'PAINT_VERTEX': 'vertex_tool',
+    'PAINT_GPENCIL': 'gpencil_tool',
+    'VERTEX_GPENCIL': 'gpencil_vertex_tool',
+}
+
+
+def file_fingerprint(filepath):
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return [stat.st_mtime, stat.st_size]
+
+
+def brush_info(brush):
+    """Mode flags, tool types and custom icon of a brush data block or of a similar object,
+    the same as read_brushes returns for a brush in a file
+    """
+    modes = []
+    tools = {}
+    for mode, flag in MODE_FLAGS.items():
+        if not getattr(brush, flag, False):
+            continue
+        modes.append(mode)
+        tool = getattr(brush, MODE_TOOLS[mode], None)
+        if tool is not None:
+            tools[mode] = tool
+    return {
+        'modes': modes,
+        'tools': tools,
+        'use_custom_icon': bool(getattr(brush, 'use_custom_icon', False)),
+        'icon_filepath': getattr(brush, 'icon_filepath', ''),
+    }
+
+
+class LibraryIndex:
+    """Brushes of every .blend file in the library, stored in the library root.
+
+    Every file entry is keyed by the path relative to the root and keeps
+    the file fingerprint (mtime, size) it has been read with.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.filepath = os.path.join(root, INDEX_FILE_NAME)
+        self.files = {}
+        self.is_dirty = False
+        self.lock = RLock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(data, dict) or data.get('version') != INDEX_VERSION:
+            return False
+        with self.lock:
+            self.files = data.get('files', {})
+        return True
+
+    def save(self):
+        with self.lock:
+            if not self.is_dirty:
+                return True
+            data = {'version': INDEX_VERSION, 'files': self.files}
+            temp_path = self.filepath + '.tmp'
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(temp_path, self.filepath)
+            except OSError:
+                # The library could be read only, keep the index in memory
+                return False
+            self.is_dirty = False
+        return True
+
+    def key(self, filepath):
+        return os.path.relpath(filepath, self.root).replace('\\', '/')
+
+    def get_entry(self, filepath):
+        """Return the file entry if it is up to date with the file on disk
+        """
+        fingerprint = file_fingerprint(filepath)
+        if fingerprint is None:
+            return None
+        with self.lock:
+            entry = self.files.get(self.key(filepath))
+        if entry is None or entry.get('fingerprint') != fingerprint:
+            return None
+        return entry
+
+    def set_entry(self, filepath, brushes):
+        """Store brushes of the file, brushes is a dict of name: brush_info
+        """
+        entry = {
+            'fingerprint': file_fingerprint(filepath),
+            'brushes': brushes,
+        }
+        with self.lock:
+            self.files[self.key(filepath)] = entry
+            self.is_dirty = True
+        return entry
+
+    def update_brushes(self, filepath, brushes):
+        """Fill in the unknown info of brushes that have been read from the data
+        """
+        with self.lock:
+            entry = self.files.get(self.key(filepath))
+            if entry is None:
+                return None
+            for name, info in brushes.items():
+                if entry['brushes'].get(name) is not None:
+                    continue
+                entry['brushes'][name] = info
+                self.is_dirty = True
+        return entry
+
+    def get_brushes(self, filepath, reader):
+        """Return a dict of brushes in the file, read it only if it has been changed
+        """
+        entry = self.get_entry(filepath)
+        if entry is None:
+            entry = self.set_entry(filepath, reader(filepath))
+        return entry['brushes']
+
+    def prune(self):
+        """Remove the entries of files that do not exist anymore
+        """
+        with self.lock:
+            for key in list(self.files):
+                if not os.path.isfile(os.path.join(self.root, key)):
+                    del self.files[key]
+                    self.is_dirty = True
+
+
+_indexes = {}
+_indexes_lock = RLock()
+
+
+def get_library_index(root):
+    if not root or not os.path.isdir(root):
+        return None
+    root = os.path.normpath(root)
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = LibraryIndex(root)
+            _indexes[root] = index
+    return index
+
+
+def save_library_indexes():
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        index.save()
+
+
+def clear_library_indexes():
+    with _indexes_lock:
+        _indexes.clear()
@@ -0,0 +1,151 @@
+import os
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from .library_index import get_library_index
+from .blend_reader import read_brushes
+
+
+MAX_WORKERS = 4
+
+
+class LibraryScan:
+    """Categories of a library root, filled in by the worker threads
+    """
+
+    def __init__(self, root, generation):
+        self.root = root
+        self.generation = generation
+        self.categories = []
+        self.total = 0
+        self.done = 0
+        self.is_walked = False
+
+    @property
+    def is_finished(self):
+        return self.is_walked and self.done >= self.total
+
+    @property
+    def progress(self):
+        if not self.is_walked:
+            return 0.0
+        if not self.total:
+            return 1.0
+        return self.done / self.total
+
+
+class LibraryScanner:
+    """Scan library roots on a thread pool and keep the results in a shared cache.
+
+    Every scan of a root gets a new generation number, the results of older
+    generations are discarded. A rescan is pending until its folders have been
+    walked, the previous scan of the root is served until then.
+
+    The workers read the brushes of every file into the library index, the
+    category lists then read them from the index instead of the files.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.max_workers = max_workers
+        self.executor = None
+        self.lock = Lock()
+        self.generation = 0
+        self.scans = {}
+        self.pending = {}
+
+    def scan(self, root):
+        if not root or not os.path.isdir(root):
+            return None
+        root = os.path.normpath(root)
+        with self.lock:
+            self.generation += 1
+            scan = LibraryScan(root, self.generation)
+            if root in self.scans:
+                self.pending[root] = scan
+            else:
+                self.scans[root] = scan
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='BrushManagerScan')
+        self.executor.submit(self._walk, scan, self.executor)
+        return scan
+
+    def get_scan(self, root):
+        if not root:
+            return None
+        with self.lock:
+            return self.scans.get(os.path.normpath(root))
+
+    def is_scanning(self):
+        with self.lock:
+            scans = list(self.scans.values()) + list(self.pending.values())
+        return any(not scan.is_finished for scan in scans)
+
+    def is_current(self, scan):
+        return self.pending.get(scan.root, self.scans.get(scan.root)) is scan
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.scans.clear()
+            self.pending.clear()
+
+    def shutdown(self):
+        self.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def _walk(self, scan, executor):
+        categories = []
+        files = []
+        try:
+            folders = os.listdir(scan.root)
+        except OSError:
+            folders = []
+        for folder in folders:
+            if not self.is_current(scan):
+                return None
+            directory = os.path.join(scan.root, folder)
+            if not os.path.isdir(directory):
+                continue
+            try:
+                b_files = [fn for fn in os.listdir(directory) if fn.lower().endswith(".blend")]
+            except OSError:
+                continue
+            if not b_files:
+                continue
+            categories.append(folder)
+            files += [os.path.join(directory, fn) for fn in b_files]
+
+        index = get_library_index(scan.root)
+        with self.lock:
+            if not self.is_current(scan):
+                return None
+            scan.categories = categories
+            scan.total = len(files) if index is not None else 0
+            scan.is_walked = True
+            if self.pending.get(scan.root) is scan:
+                self.scans[scan.root] = self.pending.pop(scan.root)
+
+        if index is None:
+            return None
+        for filepath in files:
+            try:
+                executor.submit(self._read_file, scan, index, filepath)
+            except RuntimeError:
+                # The executor has been shut down
+                return None
+
+    def _read_file(self, scan, index, filepath):
+        try:
+            if self.is_current(scan):
+                index.get_brushes(filepath, read_brushes)
+        except Exception:
+            # Left for the main thread to read it with the library loader
+            pass
+        finally:
+            with self.lock:
+                scan.done += 1
+
+
+scanner = LibraryScanner()
@@ -0,0 +1,141 @@
+import os
+
+
+class PreviewStore:
+    """Previews of one collection, shared by the brush lists which show them.
+
+    A preview is keyed by (name, icon path), where the name is the mode and
+    the brush name and the icon path includes the icon theme folder. It is
+    removed from the collection when the last list releases it.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._names = {}
+        self._users = {}
+
+    def lists(self, count):
+        return [PreviewList(self) for _ in range(count)]
+
+    def preview_name(self, key):
+        return self._names.get(key)
+
+    def users(self, key):
+        return self._users.get(key, 0)
+
+    def acquire(self, key, load):
+        """Return the preview of the key, load it with load(preview_name) if it is new
+        """
+        name = self._names.get(key)
+        if name is None:
+            name = '|'.join(key)
+            preview = load(name)
+            self._names[key] = name
+            self._users[key] = 0
+        else:
+            preview = self.collection[name]
+        self._users[key] += 1
+        return preview
+
+    def release(self, key):
+        self._users[key] -= 1
+        if self._users[key] > 0:
+            return None
+        name = self._names.pop(key)
+        del self._users[key]
+        if name in self.collection:
+            del self.collection[name]
+
+    def clear(self):
+        self.collection.clear()
+        self._names.clear()
+        self._users.clear()
+
+
+class PreviewList:
+    """Previews of one brush list, looked up by name like a preview collection.
+
+    The previews come from the store, so a brush icon which is in several
+    lists is loaded once.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.my_previews_dir = ""
+        self.my_previews = ()
+        self._keys = {}
+
+    def __contains__(self, name):
+        return name in self._keys
+
+    def __getitem__(self, name):
+        return self.store.collection[self.store.preview_name(self._keys[name])]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def names(self):
+        return list(self._keys)
+
+    def get(self, name, default=None):
+        if name not in self._keys:
+            return default
+        return self[name]
+
+    def _acquire(self, name, key, load):
+        if self._keys.get(name) == key:
+            return self[name]
+        preview = self.store.acquire(key, load)
+        self.pop(name)
+        self._keys[name] = key
+        return preview
+
+    def load(self, name, filepath, filetype):
+        return self._acquire(
+            name, (name, filepath),
+            lambda preview_name: self.store.collection.load(preview_name, filepath, filetype))
+
+    def load_safe(self, name, filepath, filetype):
+        if name in self._keys:
+            return self[name]
+        return self.load(name, filepath, filetype)
+
+    def load_from_atlas(self, name, atlas, key):
+        return self._acquire(
+            name, (name, os.path.join(atlas.filepath, key)),
+            lambda preview_name: self.store.collection.load_from_atlas(preview_name, atlas, key))
+
+    def pop(self, name):
+        key = self._keys.pop(name, None)
+        if key is not None:
+            self.store.release(key)
+
+    def rename(self, old_name, new_name):
+        """Look up the preview of old_name by new_name, the preview stays loaded
+        """
+        key = self._keys.pop(old_name, None)
+        if key is None:
+            return None
+        self.pop(new_name)
+        self._keys[new_name] = key
+
+    def clear(self):
+        for key in self._keys.values():
+            self.store.release(key)
+        self._keys.clear()
+
+    def _preview_names(self, names):
+        return [self.store.preview_name(self._keys[n]) for n in names if n in self._keys]
+
+    def prioritize(self, names, priority=0):
+        self.store.collection.prioritize(self._preview_names(names), priority)
+
+    def cancel_many(self, names):
+        """Stop loading the icons which are in no other list
+        """
+        names = [n for n in names if n in self._keys and self.store.users(self._keys[n]) == 1]
+        cancelled = set(self.store.collection.cancel_many(self._preview_names(names)))
+        return [n for n in names if self.store.preview_name(self._keys[n]) in cancelled]
+
+    def resume(self, names):
+        self.store.collection.resume(self._preview_names(names))
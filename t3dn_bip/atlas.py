@@ -0,0 +1,159 @@
+'''Atlas files that hold the previews of a whole icon folder.
+
+Layout, little endian:
+-   Header: magic 'BIPA', version, flags, entry count.
+-   Index: per entry the name length, the UTF-8 name, then width, height,
+    offset and length of the icon and of the image.
+-   Payloads: RGBa int32 pixels like load_file returns, each aligned to
+    4 bytes, zlib compressed if the ATLAS_ZLIB flag is set.
+
+An atlas is read through mmap, raw payloads are used without a copy.
+'''
+
+import os
+import mmap
+import struct
+from array import array
+from zlib import compress, decompress
+
+MAGIC = b'BIPA'
+VERSION = 1
+EXT = '.bipa'
+
+ATLAS_ZLIB = 1 << 0
+
+_HEADER = struct.Struct('<4sHHI')
+_NAME = struct.Struct('<H')
+_ENTRY = struct.Struct('<HHIIHHII')
+
+
+class Atlas:
+    '''Read-only atlas file, mapped into memory.'''
+
+    def __init__(self, filepath: str):
+        '''Map the file and read the index.
+
+        Raises:
+            OSError: If the file can't be opened.
+            ValueError: If the file is not a supported atlas.
+        '''
+        self.filepath = filepath
+
+        with open(filepath, 'rb') as file:
+            self._mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._index = self._read_index()
+        except (struct.error, UnicodeDecodeError, ValueError) as e:
+            self._mapped.close()
+            raise ValueError(f'invalid atlas file: {e}')
+
+    def _read_index(self) -> dict:
+        '''Return entry records by name.'''
+        magic, version, flags, count = _HEADER.unpack_from(self._mapped, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('unsupported format')
+
+        self.flags = flags
+        index = {}
+        offset = _HEADER.size
+        for _ in range(count):
+            length, = _NAME.unpack_from(self._mapped, offset)
+            offset += _NAME.size
+            name = self._mapped[offset:offset + length].decode('utf-8')
+            offset += length
+            index[name] = _ENTRY.unpack_from(self._mapped, offset)
+            offset += _ENTRY.size
+
+        return index
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def _pixels(self, offset: int, length: int):
+        '''Return pixels of a payload, a view into the mapped file if it's raw.'''
+        if self.flags & ATLAS_ZLIB:
+            return array('i', decompress(self._mapped[offset:offset + length]))
+
+        return memoryview(self._mapped)[offset:offset + length].cast('i')
+
+    def read(self, key: str) -> dict:
+        '''Return preview data of an entry, see load_file.
+
+        Call the release function of the returned dictionary when the
+        pixels are no longer used.
+        '''
+        iw, ih, icon_offset, icon_length, mw, mh, image_offset, image_length = self._index[key]
+        icon_pixels = self._pixels(icon_offset, icon_length)
+        image_pixels = self._pixels(image_offset, image_length)
+
+        assert len(icon_pixels) == iw * ih, 'unexpected amount of pixels'
+        assert len(image_pixels) == mw * mh, 'unexpected amount of pixels'
+
+        def release():
+            if isinstance(icon_pixels, memoryview):
+                icon_pixels.release()
+                image_pixels.release()
+
+        return {
+            'icon_size': (iw, ih),
+            'icon_pixels': icon_pixels,
+            'image_size': (mw, mh),
+            'image_pixels': image_pixels,
+            'release': release,
+        }
+
+    def close(self):
+        '''Unmap the file, all read pixels have to be released before.'''
+        self._mapped.close()
+
+
+def write(filepath: str, entries: dict, use_zlib: bool = False):
+    '''Write an atlas of preview data by name, see load_file.'''
+    flags = ATLAS_ZLIB if use_zlib else 0
+    names = sorted(entries)
+
+    payloads = []
+    for name in names:
+        data = entries[name]
+        for key in ('icon_pixels', 'image_pixels'):
+            payload = data[key].tobytes()
+            payloads.append(compress(payload) if use_zlib else payload)
+
+    encoded = [name.encode('utf-8') for name in names]
+    index_size = sum(_NAME.size + len(name) + _ENTRY.size for name in encoded)
+    offset = _HEADER.size + index_size
+
+    records = []
+    chunks = []
+    for payload in payloads:
+        padding = -offset % 4
+        chunks.append(b'\0' * padding + payload)
+        offset += padding
+        records.append((offset, len(payload)))
+        offset += len(payload)
+
+    index = []
+    for i, name in enumerate(names):
+        data = entries[name]
+        icon_record = records[2 * i]
+        image_record = records[2 * i + 1]
+        index.append(_NAME.pack(len(encoded[i])) + encoded[i])
+        index.append(_ENTRY.pack(
+            *data['icon_size'], *icon_record,
+            *data['image_size'], *image_record,
+        ))
+
+    temp_path = filepath + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, flags, len(names)))
+        file.write(b''.join(index))
+        file.write(b''.join(chunks))
+
+    os.replace(temp_path, filepath)
@@ -0,0 +1,168 @@
+'''Convert decoded images to preview data with NumPy, several at once.
+
+Does what the Pillow chain in utils.load_file does, flip, premultiply,
+downsample and make the 32x32 icon, as array operations over a batch of
+images of the same size. Downsampling averages pixel blocks when the
+target size divides the image size, other sizes are resized by Pillow.
+The pixels are returned as array('i') like the Pillow chain returns them.
+'''
+
+from array import array
+from . import settings
+
+np = None
+_tried = False
+
+ICON_SIZE = (32, 32)
+
+
+def support_numpy() -> bool:
+    '''Check whether the NumPy path is enabled and NumPy is installed.'''
+    global np
+    global _tried
+
+    if not settings.USE_NUMPY:
+        return False
+
+    if not _tried:
+        _tried = True
+        try:
+            import numpy as np
+        except ImportError:
+            pass
+
+    return np is not None
+
+
+def fit_size(size: tuple, max_size: tuple) -> tuple:
+    '''Return the size of an image scaled down to fit inside maximum, like utils._resize_image.'''
+    if (not max_size[0] or size[0] <= max_size[0]) and (not max_size[1] or size[1] <= max_size[1]):
+        return tuple(size)
+
+    scale = min(
+        max_size[0] / size[0] if max_size[0] else 1,
+        max_size[1] / size[1] if max_size[1] else 1,
+    )
+    return tuple(int(n * scale) for n in size)
+
+
+def premultiply(batch: 'np.ndarray') -> 'np.ndarray':
+    '''Return flipped and premultiplied copies of (n, height, width, 4) RGBA images.'''
+    batch = batch[:, ::-1].copy()
+
+    # Premultiplying doesn't change opaque images, which most icons are.
+    translucent = np.flatnonzero((batch[..., 3] != 255).any(axis=(1, 2)))
+    if not len(translucent):
+        return batch
+
+    # Round like Pillow does for RGBa.
+    images = batch[translucent].astype(np.uint16)
+    rgb = images[..., :3]
+    rgb *= images[..., 3:]
+    rgb += 128
+    rgb += rgb >> 8
+    rgb >>= 8
+    batch[translucent] = images
+    return batch
+
+
+def downsample(batch: 'np.ndarray', size: tuple) -> 'np.ndarray':
+    '''Return (n, height, width, 4) images resized to size, which is (width, height).'''
+    count, height, width, _ = batch.shape
+    if (width, height) == tuple(size):
+        return batch
+
+    if width % size[0] == 0 and height % size[1] == 0:
+        fx = width // size[0]
+        fy = height // size[1]
+        dtype = np.uint16 if fx * fy <= 257 else np.uint32
+
+        # Add up whole rows, then whole pixels, so every step reads contiguous memory.
+        rows = batch.reshape(count, size[1], fy, width * 4)
+        total = rows[:, :, 0].astype(dtype)
+        for y in range(1, fy):
+            total += rows[:, :, y]
+
+        pixels = total.reshape(count, size[1], size[0], fx, 4)
+        block = pixels[:, :, :, 0].copy()
+        for x in range(1, fx):
+            block += pixels[:, :, :, x]
+
+        block += fx * fy // 2
+        block //= fx * fy
+        return block.astype(np.uint8)
+
+    from PIL import Image
+
+    resized = np.empty((count, size[1], size[0], 4), dtype=np.uint8)
+    for index in range(count):
+        image = Image.frombuffer('RGBa', (width, height), batch[index].tobytes(), 'raw', 'RGBa', 0, 1)
+        resized[index] = np.asarray(image.resize(size=tuple(size)))
+    return resized
+
+
+def _pixels(image: 'np.ndarray') -> array:
+    '''Return the pixels of a (height, width, 4) image as int32 array.'''
+    return array('i', np.ascontiguousarray(image).tobytes())
+
+
+def convert(images: list, max_size: tuple) -> list:
+    '''Return preview data of RGBA Pillow images, see utils.load_file.'''
+    groups = {}
+    for index, image in enumerate(images):
+        groups.setdefault(image.size, []).append(index)
+
+    results = [None] * len(images)
+
+    for size, indices in groups.items():
+        batch = premultiply(np.stack([np.asarray(images[index]) for index in indices]))
+        image_size = fit_size(size, max_size)
+        image_batch = downsample(batch, image_size)
+
+        icon_size = image_size
+        icon_batch = image_batch
+        if image_size[0] > ICON_SIZE[0] or image_size[1] > ICON_SIZE[1]:
+            icon_size = ICON_SIZE
+            icon_batch = downsample(image_batch, ICON_SIZE)
+
+        for position, index in enumerate(indices):
+            image_pixels = _pixels(image_batch[position])
+            icon_pixels = image_pixels if icon_batch is image_batch else _pixels(icon_batch[position])
+            results[index] = {
+                'icon_size': icon_size,
+                'icon_pixels': icon_pixels,
+                'image_size': image_size,
+                'image_pixels': image_pixels,
+            }
+
+    return results
+
+
+def load_files(filepaths: list, max_size: tuple) -> list:
+    '''Load preview data of several image files, see utils.load_file.
+
+    Images that need Pillow are converted together if NumPy is available.
+    '''
+    from .utils import is_bip, load_file, support_pillow
+
+    results = [None] * len(filepaths)
+    pending = []
+
+    for index, filepath in enumerate(filepaths):
+        if is_bip(filepath) or not support_pillow() or not support_numpy():
+            results[index] = load_file(filepath, max_size)
+        else:
+            pending.append(index)
+
+    if pending:
+        from PIL import Image
+
+        images = []
+        for index in pending:
+            with Image.open(filepaths[index]) as image:
+                images.append(image.convert('RGBA'))
+
+        for index, data in zip(pending, convert(images, max_size)):
+            results[index] = data
+
+    return results
@@ -0,0 +1,206 @@
+'''Disk cache of decoded preview pixels.
+
+Entries hold the RGBa int32 pixels that load_file returns, so a warm start
+maps them from disk instead of decoding the images again. An entry is
+named after the image path, modification time, file size, max size and
+whether NumPy converted the pixels, see settings.USE_NUMPY. The least
+recently used entries are removed when the cache grows over
+settings.CACHE_MAX_SIZE.
+'''
+
+import os
+import mmap
+import struct
+from hashlib import sha1
+from threading import Lock
+from . import settings
+
+MAGIC = b'BIPC'
+HEADER = struct.Struct('<4sHHHHII')
+EXT = '.bipc'
+
+_lock = Lock()
+_total_size = None
+
+
+def _entry_path(filepath: str, max_size: tuple) -> str:
+    '''Return the cache file path for the image, or None if it doesn't exist.'''
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+
+    key = '|'.join((
+        os.path.abspath(filepath),
+        str(stat.st_mtime_ns),
+        str(stat.st_size),
+        'x'.join(map(str, max_size)),
+        'numpy' if settings.USE_NUMPY else 'array',
+    ))
+    return os.path.join(settings.CACHE_DIR, sha1(key.encode('utf-8')).hexdigest() + EXT)
+
+
+def _entries() -> list:
+    '''Return (mtime, size, path) of all cache entries.'''
+    entries = []
+
+    try:
+        with os.scandir(settings.CACHE_DIR) as it:
+            for entry in it:
+                if entry.name.endswith(EXT):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError:
+        pass
+
+    return entries
+
+
+def read(filepath: str, max_size: tuple) -> dict:
+    '''Return cached preview data of the image or None.
+
+    The pixels are memoryviews of the mapped entry, call the release
+    function of the returned dictionary when they are no longer used.
+    '''
+    if not settings.CACHE_DIR:
+        return None
+
+    path = _entry_path(filepath, max_size)
+    if path is None:
+        return None
+
+    try:
+        with open(path, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        magic, iw, ih, mw, mh, icon_length, image_length = HEADER.unpack_from(mapped)
+        assert magic == MAGIC, 'not a cache entry'
+        assert HEADER.size + 4 * (icon_length + image_length) <= len(mapped), 'truncated entry'
+    except (struct.error, AssertionError):
+        mapped.close()
+        return None
+
+    # The modification time is the recent use for the eviction.
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+    pixels = memoryview(mapped)[HEADER.size:HEADER.size + 4 * (icon_length + image_length)].cast('i')
+    icon_pixels = pixels[:icon_length]
+    image_pixels = pixels[icon_length:]
+
+    def release():
+        icon_pixels.release()
+        image_pixels.release()
+        pixels.release()
+        mapped.close()
+
+    return {
+        'icon_size': (iw, ih),
+        'icon_pixels': icon_pixels,
+        'image_size': (mw, mh),
+        'image_pixels': image_pixels,
+        'release': release,
+    }
+
+
+def write(filepath: str, max_size: tuple, data: dict):
+    '''Store preview data of the image and evict old entries if necessary.'''
+    global _total_size
+
+    if not settings.CACHE_DIR or settings.CACHE_MAX_SIZE <= 0:
+        return
+
+    path = _entry_path(filepath, max_size)
+    if path is None:
+        return
+
+    icon = data['icon_pixels'].tobytes()
+    image = data['image_pixels'].tobytes()
+    header = HEADER.pack(
+        MAGIC,
+        *data['icon_size'],
+        *data['image_size'],
+        len(icon) // 4,
+        len(image) // 4,
+    )
+
+    temp_path = f'{path}.{os.getpid()}.{id(data)}.tmp'
+    try:
+        os.makedirs(settings.CACHE_DIR, exist_ok=True)
+        with open(temp_path, 'wb') as file:
+            file.write(header)
+            file.write(icon)
+            file.write(image)
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return
+
+    with _lock:
+        if _total_size is None:
+            _total_size = sum(size for _, size, _ in _entries())
+        else:
+            _total_size += len(header) + len(icon) + len(image)
+
+        if _total_size > settings.CACHE_MAX_SIZE:
+            _evict()
+
+
+def _evict():
+    '''Remove least recently used entries down to 3/4 of the size cap. Needs the lock.'''
+    global _total_size
+
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    limit = settings.CACHE_MAX_SIZE * 3 // 4
+
+    for _, size, path in entries:
+        if total <= limit:
+            break
+
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+
+        total -= size
+
+    _total_size = total
+
+
+def load_file(filepath: str, max_size: tuple, loader) -> dict:
+    '''Return preview data from the cache, or load it with the loader and cache it.'''
+    data = read(filepath, max_size)
+    if data is not None:
+        return data
+
+    data = loader(filepath, max_size)
+    write(filepath, max_size, data)
+    return data
+
+
+def total_size() -> int:
+    '''Return the size of all cache entries in bytes.'''
+    return sum(size for _, size, _ in _entries())
+
+
+def purge():
+    '''Remove all cache entries.'''
+    global _total_size
+
+    with _lock:
+        for _, _, path in _entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        _total_size = 0
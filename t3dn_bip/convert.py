@@ -0,0 +1,286 @@
+'''Convert images to BIP2 files, which load without Pillow.
+
+Usage (needs Pillow, runs without Blender):
+
+    python -m t3dn_bip.convert [--force] [--raw] [--levels 64,128,256] PATH [PATH ...]
+
+Every PNG or JPG file in the given folders, or given directly, is written
+next to the source with the .bip extension. It holds the 32x32 icon and
+the image at every level that is not larger than the source, so loading
+picks the smallest stored level that covers the requested size and only
+scales it down from there. With --raw the payloads are stored uncompressed
+in .bipr files, which are mapped into memory instead of decompressed.
+Files that are newer than their source are skipped unless --force is
+given. With --atlas the images of every given folder are also packed into
+one atlas file next to it.
+'''
+
+import os
+import sys
+import struct
+import argparse
+from zlib import compress
+from typing import TYPE_CHECKING
+from importlib.util import find_spec
+from .formats import BIP_FORMATS, PIL_FORMATS
+from . import atlas
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+ICON_SIZE = (32, 32)
+LEVELS = (64, 128, 256)
+SOURCE_EXTS = tuple(ext for spec in PIL_FORMATS.values() for ext in spec.exts)
+
+
+def _to_rgba(image) -> 'Image.Image':
+    '''Flip and premultiply like utils.load_file.'''
+    from PIL import Image
+
+    image = image.transpose(Image.FLIP_TOP_BOTTOM)
+    return image.convert('RGBA').convert('RGBa')
+
+
+def _fit(image, max_size: tuple) -> 'Image.Image':
+    '''Scale image down to fit inside max size.'''
+    if not max_size[0] and not max_size[1]:
+        return image
+
+    scale = min(
+        max_size[0] / image.size[0] if max_size[0] else 1,
+        max_size[1] / image.size[1] if max_size[1] else 1,
+    )
+    if scale >= 1:
+        return image
+
+    return image.resize(size=[max(int(n * scale), 1) for n in image.size])
+
+
+def encode(images: list) -> bytes:
+    '''Return BIP2 file content of (width, height, RGBa bytes) images.
+
+    The first image is the icon and the last one the image of a preview.
+    '''
+    assert 0 < len(images) < 256, 'unexpected amount of images'
+
+    magic = BIP_FORMATS['BIP2'].magic
+    headers = []
+    payloads = []
+    for width, height, pixels in images:
+        payload = compress(pixels)
+        headers.append(struct.pack('>HHI', width, height, len(payload)))
+        payloads.append(payload)
+
+    return b''.join([magic, bytes([len(images)]), *headers, *payloads])
+
+
+def encode_raw(images: list) -> bytes:
+    '''Return BIPR file content of (width, height, RGBa bytes) images.
+
+    Like BIP2 without compression, every payload starts at a multiple of
+    4 bytes so it can be mapped as int32 pixels.
+    '''
+    assert 0 < len(images) < 256, 'unexpected amount of images'
+
+    magic = BIP_FORMATS['BIPR'].magic
+    headers = []
+    payloads = []
+    offset = len(magic) + 1 + 8 * len(images)
+    for width, height, pixels in images:
+        padding = -offset % 4
+        headers.append(struct.pack('>HHI', width, height, len(pixels)))
+        payloads.append(b'\0' * padding + pixels)
+        offset += padding + len(pixels)
+
+    return b''.join([magic, bytes([len(images)]), *headers, *payloads])
+
+
+def _output_path(src: str, raw: bool) -> str:
+    '''Return the BIP file path of an image.'''
+    spec = BIP_FORMATS['BIPR' if raw else 'BIP2']
+    return os.path.splitext(src)[0] + spec.exts[0]
+
+
+def convert_file(src: str, dst: str = None, levels: tuple = LEVELS, raw: bool = False) -> str:
+    '''Convert an image file to BIP2, or BIPR if raw, and return the output path.
+
+    Levels are the max image sizes to store, ascending.
+    '''
+    from PIL import Image
+
+    if dst is None:
+        dst = _output_path(src, raw)
+
+    with Image.open(src) as image:
+        image = _to_rgba(image)
+
+    icon = image
+    if image.size[0] > ICON_SIZE[0] or image.size[1] > ICON_SIZE[1]:
+        icon = image.resize(size=ICON_SIZE)
+
+    images = [(*icon.size, icon.tobytes())]
+    sizes = set()
+    for level in sorted(levels):
+        scaled = _fit(image, (level, level))
+        if scaled.size not in sizes:
+            sizes.add(scaled.size)
+            images.append((*scaled.size, scaled.tobytes()))
+
+    content = encode_raw(images) if raw else encode(images)
+
+    temp_path = dst + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(content)
+    os.replace(temp_path, dst)
+
+    return dst
+
+
+def is_outdated(src: str, raw: bool = False) -> bool:
+    '''Check whether the BIP file of an image is missing or older.'''
+    dst = _output_path(src, raw)
+
+    try:
+        return os.path.getmtime(dst) < os.path.getmtime(src)
+    except OSError:
+        return True
+
+
+def find_images(paths: list) -> list:
+    '''Return the image files in the given files and folders.'''
+    images = []
+
+    for path in paths:
+        if os.path.isfile(path):
+            images.append(path)
+            continue
+
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(SOURCE_EXTS):
+                    images.append(os.path.join(dirpath, filename))
+
+    return images
+
+
+def convert(paths: list, levels: tuple = LEVELS, force: bool = False, raw: bool = False) -> tuple:
+    '''Convert the images in the given files and folders.
+
+    Returns:
+        A tuple of converted paths and (path, error) of failed ones.
+    '''
+    converted = []
+    failed = []
+
+    for src in find_images(paths):
+        if not force and not is_outdated(src, raw):
+            continue
+
+        try:
+            converted.append(convert_file(src, levels=levels, raw=raw))
+        except Exception as e:
+            failed.append((src, str(e)))
+
+    return converted, failed
+
+
+def _atlas_sources(folder: str) -> dict:
+    '''Return the image file names of a folder by entry name, BIP files before their sources.'''
+    files = {}
+    for filename in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(filename)
+        ext = ext.lower()
+        if any(ext in spec.exts for spec in BIP_FORMATS.values()):
+            files[stem] = filename
+        elif ext in SOURCE_EXTS:
+            files.setdefault(stem, filename)
+    return files
+
+
+def atlas_is_outdated(folder: str, dst: str = None) -> bool:
+    '''Check whether the atlas of a folder is missing or older than the folder or one of its images.
+
+    Raises:
+        OSError: If the folder can't be read.
+    '''
+    folder = os.path.normpath(folder)
+    if dst is None:
+        dst = folder + atlas.EXT
+    try:
+        atlas_time = os.path.getmtime(dst)
+    except OSError:
+        return True
+
+    if os.path.getmtime(folder) > atlas_time:
+        return True
+    return any(
+        os.path.getmtime(os.path.join(folder, filename)) > atlas_time
+        for filename in _atlas_sources(folder).values()
+    )
+
+
+def build_atlas(folder: str, dst: str = None, max_size: tuple = (128, 128), use_zlib: bool = False) -> str:
+    '''Pack the images of a folder into an atlas and return its path.
+
+    Entries are named after the image file names without extension. BIP
+    files are used instead of their sources, so only folders with images
+    that are not converted need Pillow.
+    '''
+    from .batch import load_files
+
+    folder = os.path.normpath(folder)
+    if dst is None:
+        dst = folder + atlas.EXT
+
+    files = _atlas_sources(folder)
+    paths = [os.path.join(folder, filename) for filename in files.values()]
+    entries = dict(zip(files, load_files(paths, max_size)))
+
+    try:
+        atlas.write(dst, entries, use_zlib)
+    finally:
+        for data in entries.values():
+            if 'release' in data:
+                data['release']()
+
+    return dst
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description='Convert images to BIP2 files.')
+    parser.add_argument('paths', nargs='+', help='image files or folders')
+    parser.add_argument(
+        '--levels',
+        type=lambda value: tuple(int(n) for n in value.split(',')),
+        default=LEVELS,
+        help='comma separated max image sizes to store',
+    )
+    parser.add_argument('--force', action='store_true', help='convert up to date files again')
+    parser.add_argument('--raw', action='store_true', help='write uncompressed .bipr files')
+    parser.add_argument('--atlas', action='store_true', help='also pack each folder into an atlas')
+    args = parser.parse_args(argv)
+
+    if find_spec('PIL') is None:
+        print('Pillow is required to convert images.')
+        return 1
+
+    converted, failed = convert(args.paths, args.levels, args.force, args.raw)
+    for src, error in failed:
+        print(f'Failed to convert {src}: {error}')
+    print(f'Converted {len(converted)} files, {len(failed)} failed.')
+
+    if args.atlas:
+        for path in args.paths:
+            if os.path.isdir(path):
+                try:
+                    print(f'Packed {build_atlas(path)}')
+                except Exception as e:
+                    print(f'Failed to pack {path}: {e}')
+                    failed.append((path, str(e)))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
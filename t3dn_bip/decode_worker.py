@@ -0,0 +1,88 @@
+'''Decode images for processes.py. Runs as a script in a separate Python process.
+
+Reads one JSON request per line from stdin, writes the pixels into a new
+shared memory block and answers with one JSON line on stdout. The reading
+process owns the block and unlinks it.
+
+The handle of the last block stays open until the next request comes in,
+which the reading process only sends once it has opened the block. Windows
+frees a block when its last handle is closed.
+'''
+
+import os
+import sys
+import json
+from multiprocessing import shared_memory
+
+
+def _create_shared_memory(size: int) -> shared_memory.SharedMemory:
+    '''Create a shared memory block that outlives this process.'''
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(create=True, size=size, track=False)
+
+    shm = shared_memory.SharedMemory(create=True, size=size)
+
+    # Don't let the resource tracker unlink the block when we exit.
+    from multiprocessing import resource_tracker
+    resource_tracker.unregister(shm._name, 'shared_memory')
+
+    return shm
+
+
+def _decode(load_file, request: dict) -> tuple:
+    '''Load the image and move its pixels to shared memory.
+
+    Return the reply and the shared memory block, which is still open.
+    '''
+    from t3dn_bip import settings
+    settings.USE_NUMPY = request.get('use_numpy', False)
+    data = load_file(request['filepath'], tuple(request['max_size']))
+    icon = data['icon_pixels'].tobytes()
+    image = data['image_pixels'].tobytes()
+    icon_length = len(data['icon_pixels'])
+    image_length = len(data['image_pixels'])
+
+    # Mapped pixels can't be read after this.
+    if 'release' in data:
+        data['release']()
+
+    shm = _create_shared_memory(max(len(icon) + len(image), 1))
+    shm.buf[:len(icon)] = icon
+    shm.buf[len(icon):len(icon) + len(image)] = image
+
+    return {
+        'shm': shm.name,
+        'icon_size': list(data['icon_size']),
+        'icon_length': icon_length,
+        'image_size': list(data['image_size']),
+        'image_length': image_length,
+    }, shm
+
+
+def main():
+    '''Answer decode requests until stdin is closed.'''
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from t3dn_bip.utils import load_file
+
+    shm = None
+
+    for line in sys.stdin.buffer:
+        # The reading process has opened the last block.
+        if shm is not None:
+            shm.close()
+            shm = None
+
+        try:
+            reply, shm = _decode(load_file, json.loads(line))
+        except Exception as e:
+            reply = {'error': f'{type(e).__name__}: {e}'}
+
+        sys.stdout.buffer.write(json.dumps(reply).encode('utf-8') + b'\n')
+        sys.stdout.buffer.flush()
+
+    if shm is not None:
+        shm.close()
+
+
+if __name__ == '__main__':
+    main()
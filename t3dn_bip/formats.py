@@ -1,3 +1,5 @@
+import os
+import json
 from io import BytesIO
 from base64 import b64decode
 
@@ -33,6 +35,10 @@ BIP_FORMATS = {
         exts=['.bip', '.bip2'],
         magic=b'BIP2',
     ),
+    'BIPR': _BIPFormat(
+        exts=['.bipr'],
+        magic=b'BIPR',
+    ),
 }
 
 PIL_FORMATS = {
@@ -69,10 +75,54 @@ def _run_test(test: bytes) -> bool:
         return True
 
 
-def test_formats():
-    '''Test which formats are supported by Pillow.'''
-    for spec in PIL_FORMATS.values():
-        spec.supported = all(map(_run_test, spec.tests))
+def _read_results(cache_file: str, version: str) -> dict:
+    '''Return cached test results for the Pillow version, or None.'''
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as file:
+            cached = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(cached, dict) or cached.get('pillow') != version:
+        return None
+
+    results = cached.get('formats')
+    if not isinstance(results, dict) or set(results) != set(PIL_FORMATS):
+        return None
+
+    return results
+
+
+def _write_results(cache_file: str, version: str, results: dict):
+    '''Cache test results for the Pillow version.'''
+    temp_path = cache_file + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({'pillow': version, 'formats': results}, file)
+        os.replace(temp_path, cache_file)
+    except OSError:
+        pass
+
+
+def test_formats(cache_file: str = ''):
+    '''Test which formats are supported by Pillow.
+
+    The results are kept in the cache file, if given, and reused as long
+    as the Pillow version stays the same.
+    '''
+    from PIL import __version__ as version
+
+    results = _read_results(cache_file, version) if cache_file else None
+
+    if results is None:
+        results = {name: all(map(_run_test, spec.tests)) for name, spec in PIL_FORMATS.items()}
+
+        if cache_file:
+            _write_results(cache_file, version, results)
+
+    for name, spec in PIL_FORMATS.items():
+        spec.supported = bool(results[name])
 
 
 def unsupported_formats() -> bool:
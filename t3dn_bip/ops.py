@@ -1,5 +1,6 @@
 import bpy
 from .utils import install_pillow
+from . import cache
 
 
 class InstallPillow:
@@ -23,3 +24,22 @@ class InstallPillow:
             self.report({'WARNING'}, 'Failed to install Pillow')
 
         return {'FINISHED'}
+
+
+class PurgeCache:
+    '''Base class for an operator that removes the decoded pixels cache.
+
+    Usage:
+    -   Inherit bpy.types.Operator and PurgeCache.
+    -   Make sure to set bl_idname, it must be unique.
+    '''
+    bl_label = 'Purge Preview Cache'
+    bl_description = 'Remove the decoded preview pixels from the disk cache'
+    bl_options = {'REGISTER', 'INTERNAL'}
+
+    def execute(self: bpy.types.Operator, context: bpy.types.Context) -> set:
+        size = cache.total_size()
+        cache.purge()
+        self.report({'INFO'}, f'Removed {size / (1024 * 1024):.1f} MB of cached previews')
+
+        return {'FINISHED'}
@@ -3,46 +3,40 @@ import bpy.utils.previews
 from bpy.types import ImagePreview
 from threading import Event
 from typing import ItemsView, Iterator, KeysView, ValuesView
-from .utils import support_pillow, can_load, load_file
+from .utils import support_pillow, can_load, is_bip, is_raw, load_file
 from .formats import unsupported_formats
-from .threads import load_async
+from . import cache
+from .atlas import Atlas
+from .threads import load_async, cancel, prioritize, set_redraw_regions, resize as resize_threads, shutdown as shutdown_threads
 from . import settings
 
 
 class ImagePreviewCollection:
     '''Dictionary-like class of previews.'''
 
-    def __init__(self, max_size: tuple = (128, 128), lazy_load: bool = True):
-        '''Create collection and start internal timer.'''
-        if settings.WARNINGS:
-            if not support_pillow():
-                print('Pillow is not installed, therefore:')
-                print('- BIP images load without scaling.')
-
-                if lazy_load:
-                    print('- Other images load slowly (Blender standard).')
-                if lazy_load and max_size != (128, 128):
-                    print('- Other images load in 128x128 (Blender standard).')
-                elif not lazy_load and max_size != (256, 256):
-                    print('- Other images load in 256x256 (Blender standard).')
-
-            else:
-                unsupported = unsupported_formats()
-                if unsupported:
-                    print('Pillow is installed, but:')
-
-                    for name in unsupported:
-                        print(
-                            f'- {name} images are not supported by Pillow',
-                            'and load slowly (Blender standard).',
-                        )
-
+    def __init__(
+        self,
+        max_size: tuple = (128, 128),
+        lazy_load: bool = True,
+        redraw_regions: set = None,
+    ):
+        '''Create collection and start internal timer.
+
+        Redraw regions are (area type, region type) pairs that show the
+        previews, a region type of None stands for every region of such
+        areas. Every region is redrawn if they are not given.
+
+        Pillow is imported when the first image that is not BIP loads.
+        '''
         self._collection = bpy.utils.previews.new()
         self._max_size = max_size
         self._lazy_load = lazy_load
+        self._warned = not settings.WARNINGS
 
         if self._lazy_load:
             self._abort_signal = None
+            self._cancelled = {}
+            set_redraw_regions(self._collection, redraw_regions)
 
     def __len__(self) -> int:
         '''Return the amount of previews in the collection.'''
@@ -60,8 +54,20 @@ class ImagePreviewCollection:
         '''Return preview with the given name.'''
         return self._collection[key]
 
+    def __delitem__(self, key: str):
+        '''Remove and release preview with the given name.'''
+        if self._lazy_load:
+            cancel(self._collection, [key])
+            self._cancelled.pop(key, None)
+
+        del self._collection[key]
+
     def pop(self, key: str) -> ImagePreview:
         '''Remove preview with the given name and return it.'''
+        if self._lazy_load:
+            cancel(self._collection, [key])
+            self._cancelled.pop(key, None)
+
         return self._collection.pop(key)
 
     def get(self, key: str, default=None) -> ImagePreview:
@@ -105,6 +111,9 @@ class ImagePreviewCollection:
 
     def load(self, name: str, filepath: str, filetype: str) -> ImagePreview:
         '''Generate a new preview from the given filepath.'''
+        if not self._warned and not is_bip(filepath):
+            self._print_warnings()
+
         if filetype != 'IMAGE' or not can_load(filepath):
             return self._load_fallback(name, filepath, filetype)
 
@@ -123,6 +132,32 @@ class ImagePreviewCollection:
 
         return preview
 
+    def _print_warnings(self):
+        '''Print which images load slowly, once per collection.'''
+        self._warned = True
+
+        if not support_pillow():
+            print('Pillow is not installed, therefore:')
+            print('- BIP images load without scaling.')
+
+            if self._lazy_load:
+                print('- Other images load slowly (Blender standard).')
+            if self._lazy_load and self._max_size != (128, 128):
+                print('- Other images load in 128x128 (Blender standard).')
+            elif not self._lazy_load and self._max_size != (256, 256):
+                print('- Other images load in 256x256 (Blender standard).')
+
+        else:
+            unsupported = unsupported_formats()
+            if unsupported:
+                print('Pillow is installed, but:')
+
+                for name in unsupported:
+                    print(
+                        f'- {name} images are not supported by Pillow',
+                        'and load slowly (Blender standard).',
+                    )
+
     def _load_fallback(
         self,
         name: str,
@@ -140,7 +175,10 @@ class ImagePreviewCollection:
 
     def _load_eager(self, name: str, filepath: str) -> ImagePreview:
         '''Load image contents from file and load preview.'''
-        data = load_file(filepath, self._max_size)
+        if is_raw(filepath):
+            data = load_file(filepath, self._max_size)
+        else:
+            data = cache.load_file(filepath, self._max_size, load_file)
 
         preview = self.new(name)
         preview.icon_size = data['icon_size']
@@ -148,12 +186,72 @@ class ImagePreviewCollection:
         preview.image_size = data['image_size']
         preview.image_pixels = data['image_pixels']
 
+        if 'release' in data:
+            data['release']()
+
         return preview
 
+    def load_from_atlas(self, name: str, atlas: 'Atlas', key: str) -> ImagePreview:
+        '''Generate a new preview from an atlas entry, see atlas.Atlas.'''
+        data = atlas.read(key)
+
+        preview = self.new(name)
+        preview.icon_size = data['icon_size']
+        preview.icon_pixels = data['icon_pixels']
+        preview.image_size = data['image_size']
+        preview.image_pixels = data['image_pixels']
+
+        data['release']()
+
+        return preview
+
+    def prioritize(self, names: list, priority: int = 0):
+        '''Load pending previews of the given names before the others.'''
+        if self._lazy_load:
+            prioritize(self._collection, names, priority)
+
+    def cancel(self, name: str) -> bool:
+        '''Stop loading the preview of the given name, see cancel_many.'''
+        return bool(self.cancel_many([name]))
+
+    def cancel_many(self, names: list) -> list:
+        '''Stop loading the previews of the given names.
+
+        Cancelled previews stay in the collection without pixels, resume
+        loads them again.
+
+        Returns:
+            The names of the previews that were still loading.
+        '''
+        if not self._lazy_load:
+            return []
+
+        cancelled = cancel(self._collection, names)
+        self._cancelled.update(cancelled)
+
+        return [name for name, _ in cancelled]
+
+    def resume(self, names: list):
+        '''Load the cancelled previews of the given names again.'''
+        if not self._lazy_load or not self._cancelled:
+            return
+
+        for name in names:
+            filepath = self._cancelled.pop(name, None)
+            if filepath is not None and name in self:
+                load_async(
+                    self._collection,
+                    name,
+                    filepath,
+                    self._max_size,
+                    self._get_abort_signal(),
+                )
+
     def clear(self):
         '''Clear all previews.'''
         if self._lazy_load:
             self._set_abort_signal()
+            self._cancelled.clear()
 
         self._collection.clear()
 
@@ -161,6 +259,7 @@ class ImagePreviewCollection:
         '''Close the collection and clear all previews.'''
         if self._lazy_load:
             self._set_abort_signal()
+            set_redraw_regions(self._collection, None)
 
         self._collection.close()
 
@@ -181,11 +280,22 @@ class ImagePreviewCollection:
 def new(
     max_size: tuple = (128, 128),
     lazy_load: bool = True,
+    redraw_regions: set = None,
 ) -> ImagePreviewCollection:
     '''Return a new preview collection.'''
-    return ImagePreviewCollection(max_size, lazy_load)
+    return ImagePreviewCollection(max_size, lazy_load, redraw_regions)
 
 
 def remove(collection: ImagePreviewCollection):
     '''Remove the specified preview collection.'''
     collection.close()
+
+
+def resize():
+    '''Apply a changed settings.MAX_THREADS to the background loading.'''
+    resize_threads()
+
+
+def shutdown():
+    '''Stop the background loading threads.'''
+    shutdown_threads()
@@ -0,0 +1,146 @@
+'''Decode images in separate processes, one per loading thread.
+
+Pillow holds the GIL for parts of the decoding, so the loading threads
+hand the work to their own decode process and only wait on a pipe. The
+pixels come back in shared memory and are emplaced without a copy.
+'''
+
+import sys
+import json
+import subprocess
+from pathlib import Path
+from threading import Lock, local
+from multiprocessing import shared_memory
+from .utils import load_file as load_file_in_thread
+from . import settings
+
+WORKER = str(Path(__file__).with_name('decode_worker.py'))
+
+_local = local()
+_lock = Lock()
+_processes = []
+
+
+def _python_executable() -> str:
+    '''Return the Python executable for the decode processes.'''
+    if 'python' in Path(sys.executable).stem.lower():
+        return sys.executable
+
+    import bpy
+    return bpy.app.binary_path_python
+
+
+class DecodeProcess:
+    '''A decode process that answers one request at a time.'''
+
+    def __init__(self):
+        self._process = subprocess.Popen(
+            [_python_executable(), WORKER],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def load_file(self, filepath: str, max_size: tuple) -> dict:
+        '''Load image preview data, see utils.load_file.
+
+        The pixels are memoryviews into shared memory, call the release
+        function of the returned dictionary when they are no longer used.
+        '''
+        request = {'filepath': filepath, 'max_size': list(max_size), 'use_numpy': settings.USE_NUMPY}
+        try:
+            self._process.stdin.write(json.dumps(request).encode('utf-8') + b'\n')
+            self._process.stdin.flush()
+        except (OSError, ValueError):
+            raise RuntimeError('the decode process has been closed')
+
+        line = self._process.stdout.readline()
+        if not line:
+            raise RuntimeError('the decode process has stopped')
+
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise ValueError(reply['error'])
+
+        shm = shared_memory.SharedMemory(name=reply['shm'])
+        pixels = shm.buf.cast('i')
+        icon_length = reply['icon_length']
+        icon_pixels = pixels[:icon_length]
+        image_pixels = pixels[icon_length:icon_length + reply['image_length']]
+
+        def release():
+            icon_pixels.release()
+            image_pixels.release()
+            pixels.release()
+            shm.close()
+            shm.unlink()
+
+        return {
+            'icon_size': reply['icon_size'],
+            'icon_pixels': icon_pixels,
+            'image_size': reply['image_size'],
+            'image_pixels': image_pixels,
+            'release': release,
+        }
+
+    def close(self):
+        '''Let the process exit after its current request.'''
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+
+    @property
+    def is_running(self) -> bool:
+        return not self._process.stdin.closed and self._process.poll() is None
+
+
+def _current_process() -> DecodeProcess:
+    '''Return the decode process of the current thread, start one if necessary.'''
+    process = getattr(_local, 'process', None)
+
+    if process is None or not process.is_running:
+        process = DecodeProcess()
+        _local.process = process
+
+        with _lock:
+            _processes.append(process)
+
+    return process
+
+
+def load_file(filepath: str, max_size: tuple) -> dict:
+    '''Load image preview data in the decode process of the current thread.'''
+    try:
+        process = _current_process()
+    except OSError:
+        return load_file_in_thread(filepath, max_size)
+
+    try:
+        return process.load_file(filepath, max_size)
+    except (OSError, RuntimeError):
+        # The process is gone or out of step, start a new one next time.
+        close_current()
+        return load_file_in_thread(filepath, max_size)
+
+
+def close_current():
+    '''Close the decode process of the current thread.'''
+    process = getattr(_local, 'process', None)
+
+    if process is not None:
+        _local.process = None
+        process.close()
+
+        with _lock:
+            if process in _processes:
+                _processes.remove(process)
+
+
+def shutdown():
+    '''Close all decode processes.'''
+    with _lock:
+        processes = _processes[:]
+        _processes.clear()
+
+    for process in processes:
+        process.close()
@@ -4,5 +4,37 @@ WARNINGS = True
 # Use magic bytes to check file type, instead of extension.
 USE_MAGIC = False
 
+# File that keeps which formats Pillow supports, per Pillow version, so the
+# format test runs once. Empty to test on every start.
+FORMATS_CACHE_FILE = ''
+
+# Flip, premultiply and downsample images with NumPy if it is installed.
+# Downsampling averages pixel blocks, which looks slightly different from
+# the Pillow resize, so it has to be turned on.
+USE_NUMPY = False
+
 # Max number of threads used for loading image contents.
 MAX_THREADS = 4
+
+# Decode images in separate processes instead of the loading threads.
+DECODE_PROCESSES = False
+
+# Directory of the decoded pixels cache, empty to disable the cache.
+CACHE_DIR = ''
+
+# Max size of the decoded pixels cache in bytes.
+CACHE_MAX_SIZE = 64 * 1024 * 1024
+
+# Wall time limits of one emplace step in seconds, the step takes the max
+# while Blender is idle and shrinks towards the min as frames get slower.
+EMPLACE_MIN_TIME = 0.004
+EMPLACE_MAX_TIME = 0.05
+
+# Frame time in seconds at which the emplace step is at its min.
+EMPLACE_BUSY_FRAME_TIME = 0.05
+
+# Max pixel bytes emplaced in one step.
+EMPLACE_MAX_BYTES = 16 * 1024 * 1024
+
+# Min seconds between redraws while previews load.
+REDRAW_INTERVAL = 1 / 30
@@ -1,96 +1,302 @@
 import bpy
 import bpy.utils.previews
+from heapq import heappush, heappop
+from itertools import count
 from queue import Queue
-from threading import Thread, Event
+from threading import Thread, Event, Condition, current_thread
 from time import time
 from traceback import print_exc
 from multiprocessing import cpu_count
-from .utils import load_file, tag_redraw
+from .utils import is_raw, load_file, tag_redraw
+from . import cache
+from . import processes
 from . import settings
 
+# Lower numbers load first.
+PRIORITY_DEFAULT = 10
+
 _pending = 0
-_queue_read = Queue()
+_queue_read = []
+_queue_entries = {}
+_queue_count = count()
 _queue_emplace = Queue()
+_requests = {}
+_names = {}
+_condition = Condition()
 _thread_stop_signal = None
+_workers = []
+_busy = 0
+_busy_time = 0.0
+_pool_start = None
+_frame_time = 0.0
+_last_tick = None
+_last_delay = None
+_redraw_regions = {}
+_redraw_due = set()
+_redraw_all = False
+_last_redraw = 0.0
+_emplace_stats = {'ticks': 0, 'items': 0, 'bytes': 0, 'time': 0.0, 'max_tick_time': 0.0}
+
+
+class _Request:
+    '''Load of one image file for every preview that waits for it.'''
+
+    def __init__(self, filepath: str, max_size: tuple):
+        self.key = (filepath, tuple(max_size))
+        self.filepath = filepath
+        self.max_size = max_size
+        self.targets = {}
+
+    def is_aborted(self) -> bool:
+        '''Check whether every waiting preview has been aborted.'''
+        return all(signal.is_set() for _, _, signal in self.targets.values())
+
+
+def _pool_size() -> int:
+    '''Return the amount of read threads the pool should have.'''
+    return max(min(cpu_count(), settings.MAX_THREADS), 1)
+
+
+def _push_read(request: _Request, priority: int):
+    '''Queue a request for reading. Needs the condition lock.'''
+    entry = [priority, next(_queue_count), request.key, request]
+    _queue_entries[request.key] = entry
+    heappush(_queue_read, entry)
+
+
+def _pop_read() -> _Request:
+    '''Return the request with the highest priority. Needs the condition lock.'''
+    while _queue_read:
+        priority, _, key, request = heappop(_queue_read)
+
+        # Skip requests that have been queued again with another priority.
+        if request is not None:
+            del _queue_entries[key]
+            return request
+
+
+def _finish(request: _Request) -> list:
+    '''Stop taking previews for a request and return them. Needs the condition lock.'''
+    if _requests.get(request.key) is request:
+        del _requests[request.key]
+
+    for target in request.targets:
+        if _names.get(target) is request:
+            del _names[target]
+
+    return list(request.targets.values())
 
 
 def _read_thread(stop_signal: Event):
     '''Read image data in the background.'''
+    try:
+        _read_loop(stop_signal)
+    finally:
+        processes.close_current()
+
+
+def _release(data: dict):
+    '''Free the shared memory of image data from a decode process.'''
+    if data and 'release' in data:
+        data['release']()
+
+
+def _read_loop(stop_signal: Event):
+    '''Read images from the queue until we are stopped.'''
+    global _busy
+    global _busy_time
+
     # Run read loop until we are stopped.
-    while not stop_signal.is_set():
-        # Try to get the next item from the read queue. Wait up to 1 second.
-        try:
-            results = _queue_read.get(block=True, timeout=1.0)
-            collection, name, filepath, max_size, abort_signal = results
-        except:
-            continue
+    while True:
+        # Wait for the next item from the read queue.
+        with _condition:
+            while not _queue_entries and not stop_signal.is_set():
+                # Leave the pool if it has been made smaller.
+                if len(_workers) > _pool_size():
+                    _workers.remove(current_thread())
+                    return
 
-        # Try to load image.
+                _condition.wait()
+
+            if stop_signal.is_set():
+                return
+
+            request = _pop_read()
+            is_aborted = request.is_aborted()
+            _busy += 1
+
+        # Try to load image, once for every preview that waits for it.
+        start = time()
         data = None
-        if not abort_signal.is_set():
+        if not is_aborted:
             try:
-                data = load_file(filepath, max_size)
+                if is_raw(request.filepath):
+                    data = load_file(request.filepath, request.max_size)
+                else:
+                    if settings.DECODE_PROCESSES:
+                        loader = processes.load_file
+                    else:
+                        loader = load_file
+
+                    data = cache.load_file(request.filepath, request.max_size, loader)
             except:
                 print_exc()
 
+        with _condition:
+            _busy -= 1
+            _busy_time += time() - start
+            targets = _finish(request)
+
+        # The pool has been shut down, nothing waits for the data.
+        if stop_signal.is_set():
+            _release(data)
+            return
+
+        # Every preview has been cancelled while the image was loading.
+        if not targets:
+            _release(data)
+            continue
+
         # Queue for emplacement.
-        _queue_emplace.put((collection, name, data, abort_signal))
+        _queue_emplace.put((targets, data))
+
+
+def _start_threads():
+    '''Start read threads up to the pool size. Needs the condition lock.'''
+    global _thread_stop_signal
+    global _pool_start
+
+    if not _thread_stop_signal:
+        _thread_stop_signal = Event()
+        _pool_start = time()
+
+    for _ in range(_pool_size() - len(_workers)):
+        thread = Thread(
+            target=_read_thread,
+            args=(_thread_stop_signal,),
+            name='t3dn_bip_read',
+            daemon=True,
+        )
+        _workers.append(thread)
+        thread.start()
+
+
+def _measure_frame_time(now: float):
+    '''Update the frame time from how late the emplace timer runs.'''
+    global _frame_time
+
+    if _last_tick is None:
+        return
+
+    # Blender calls timers between redraws, so what it is late by is the
+    # time spent drawing and handling events.
+    late = max(now - _last_tick - _last_delay, 0.0)
+    _frame_time += (late - _frame_time) * 0.25
+
+
+def _emplace_budget() -> tuple:
+    '''Return the wall time budget and the delay to the next step.'''
+    load = min(_frame_time / settings.EMPLACE_BUSY_FRAME_TIME, 1.0)
+    budget = settings.EMPLACE_MAX_TIME - load * (settings.EMPLACE_MAX_TIME - settings.EMPLACE_MIN_TIME)
+    return budget, 0.001 + load * 0.049
+
+
+def _tag_redraw(collection):
+    '''Note the regions that show a collection for the next redraw.'''
+    global _redraw_all
+
+    regions = _redraw_regions.get(id(collection))
+    if regions is None:
+        _redraw_all = True
+    else:
+        _redraw_due.update(regions)
+
+
+def _flush_redraw(now: float, force: bool):
+    '''Redraw the noted regions, at most once per redraw interval unless forced.'''
+    global _redraw_all
+    global _last_redraw
+
+    if not _redraw_all and not _redraw_due:
+        return
+
+    if not force and now - _last_redraw < settings.REDRAW_INTERVAL:
+        return
+
+    regions = None if _redraw_all else set(_redraw_due)
+    _redraw_all = False
+    _redraw_due.clear()
+    _last_redraw = now
+
+    tag_redraw(regions)
 
 
 def _emplace_timer():
     '''Emplaces pixels into the preview object. Runs on the main thread.'''
     global _pending
-    global _thread_stop_signal
+    global _last_tick
+    global _last_delay
 
     # Variables for timer batch management.
     now = time()
-    delay = 0.1
-    redraw = False
+    _measure_frame_time(now)
+    budget, delay = _emplace_budget()
+    items = 0
+    size = 0
 
-    # Take around 100ms for this batch.
-    while time() - now < 0.1:
+    # Stop at the time or size budget, whichever comes first.
+    while time() - now < budget and size < settings.EMPLACE_MAX_BYTES:
         # Get the next item from the emplace queue.
         try:
-            results = _queue_emplace.get(block=False)
-            collection, name, data, abort_signal = results
+            targets, data = _queue_emplace.get(block=False)
         except:
             break
 
-        # Decrement images that need to be loaded.
-        _pending -= 1
+        items += 1
+        if data:
+            size += 4 * (len(data['icon_pixels']) + len(data['image_pixels']))
 
-        # Move data to preview object.
-        if not abort_signal.is_set() and name in collection:
-            try:
-                preview = collection[name]
-                preview.icon_size = data['icon_size']
-                preview.icon_pixels = data['icon_pixels']
-                preview.image_size = data['image_size']
-                preview.image_pixels = data['image_pixels']
-            except:
-                print_exc()
-            else:
-                redraw = True
+        for collection, name, abort_signal in targets:
+            # Decrement images that need to be loaded.
+            _pending -= 1
 
-    # There might be more in the queue. Let's get scheduled soon.
-    else:
-        delay = 0.01
+            # Move data to preview object.
+            if not abort_signal.is_set() and name in collection:
+                try:
+                    preview = collection[name]
+                    preview.icon_size = data['icon_size']
+                    preview.icon_pixels = data['icon_pixels']
+                    preview.image_size = data['image_size']
+                    preview.image_pixels = data['image_pixels']
+                except:
+                    print_exc()
+                else:
+                    _tag_redraw(collection)
 
-    # Redraw UI in case we updated preview objects.
-    if redraw:
-        tag_redraw()
+        _release(data)
 
-    # If no items are pending, stop read thread and emplace timer.
-    if not _pending:
-        # Stop read thread.
-        if _thread_stop_signal:
-            _thread_stop_signal.set()
-            _thread_stop_signal = None
+    # The queue is empty, give the read threads some time.
+    if _queue_emplace.empty():
+        delay = max(delay, 0.02)
+
+    # Redraw UI in case we updated preview objects, the last ones right away.
+    _flush_redraw(time(), not _pending)
 
-        # Don't schedule emplace timer.
-        delay = None
+    end = time()
+    _emplace_stats['ticks'] += 1
+    _emplace_stats['items'] += items
+    _emplace_stats['bytes'] += size
+    _emplace_stats['time'] += end - now
+    _emplace_stats['max_tick_time'] = max(_emplace_stats['max_tick_time'], end - now)
+
+    # If no items are pending, stop emplace timer. Read threads keep waiting.
+    if not _pending:
+        _last_tick = None
+        return None
 
     # Schedule next timer call.
+    _last_tick = end
+    _last_delay = delay
     return delay
 
 
@@ -100,25 +306,218 @@ def load_async(
     filepath: str,
     max_size: tuple,
     abort_signal: Event,
+    priority: int = PRIORITY_DEFAULT,
 ):
-    '''Load image asynchronously. Needs to be called on the main thread.'''
+    '''Load image asynchronously. Needs to be called on the main thread.
+
+    Previews that load the same file with the same max size while it is
+    pending share one request, so the file is read only once.
+    '''
     global _pending
-    global _thread_stop_signal
 
     # Increment images that need to be loaded.
     _pending += 1
 
-    # Queue for reading.
-    _queue_read.put((collection, name, filepath, max_size, abort_signal))
+    # Queue for reading, start read threads if the pool is not full.
+    with _condition:
+        target = (id(collection), name)
 
-    # Start read threads if they're not running.
-    if not _thread_stop_signal:
-        _thread_stop_signal = Event()
+        # An image queued again under the same name replaces the previous one.
+        previous = _names.pop(target, None)
+        if previous is not None:
+            del previous.targets[target]
+            _pending -= 1
 
-        for _ in range(max(min(cpu_count(), settings.MAX_THREADS), 1)):
-            thread = Thread(target=_read_thread, args=(_thread_stop_signal,))
-            thread.start()
+        key = (filepath, tuple(max_size))
+        request = _requests.get(key)
+
+        if request is None:
+            request = _Request(filepath, max_size)
+            _requests[key] = request
+            _push_read(request, priority)
+
+        # Join the pending or the running request of the same file.
+        else:
+            entry = _queue_entries.get(key)
+            if entry is not None and entry[3] is request and entry[0] > priority:
+                entry[3] = None
+                _push_read(request, priority)
+
+        request.targets[target] = (collection, name, abort_signal)
+        _names[target] = request
+
+        if len(_workers) < _pool_size():
+            _start_threads()
+
+        _condition.notify()
 
     # Register emplace timer if it's not running.
     if not bpy.app.timers.is_registered(_emplace_timer):
         bpy.app.timers.register(_emplace_timer, persistent=True)
+
+
+def set_redraw_regions(
+    collection: bpy.utils.previews.ImagePreviewCollection,
+    regions: set,
+):
+    '''Redraw only the given (area type, region type) pairs when previews
+    of the collection load, every region if regions is None.
+    '''
+    if regions is None:
+        _redraw_regions.pop(id(collection), None)
+    else:
+        _redraw_regions[id(collection)] = set(regions)
+
+
+def prioritize(
+    collection: bpy.utils.previews.ImagePreviewCollection,
+    names: list,
+    priority: int = 0,
+):
+    '''Move pending images of the given names ahead of the others, in the given order.'''
+    with _condition:
+        for name in names:
+            request = _names.get((id(collection), name))
+            if request is None:
+                continue
+
+            entry = _queue_entries.get(request.key)
+            if entry is None or entry[0] <= priority:
+                continue
+
+            entry[3] = None
+            _push_read(request, priority)
+
+
+def cancel(
+    collection: bpy.utils.previews.ImagePreviewCollection,
+    names: list,
+) -> list:
+    '''Stop loading images of the given names. Needs to be called on the main thread.
+
+    Requests that no preview waits for anymore are dropped before they
+    are read.
+
+    Returns:
+        Pairs of name and file path of the cancelled previews.
+    '''
+    global _pending
+
+    cancelled = []
+
+    with _condition:
+        for name in names:
+            target = (id(collection), name)
+            request = _names.pop(target, None)
+            if request is None:
+                continue
+
+            del request.targets[target]
+            _pending -= 1
+            cancelled.append((name, request.filepath))
+
+            if request.targets:
+                continue
+
+            if _requests.get(request.key) is request:
+                del _requests[request.key]
+
+            entry = _queue_entries.get(request.key)
+            if entry is not None and entry[3] is request:
+                entry[3] = None
+                del _queue_entries[request.key]
+
+    return cancelled
+
+
+def resize():
+    '''Apply a changed settings.MAX_THREADS to a running pool.'''
+    with _condition:
+        if not _workers:
+            return
+
+        if len(_workers) < _pool_size():
+            _start_threads()
+
+        # Idle threads leave the pool if there are too many.
+        _condition.notify_all()
+
+
+def shutdown():
+    '''Stop read threads and drop queued images. Needs to be called on the main thread.'''
+    global _pending
+    global _thread_stop_signal
+    global _busy_time
+    global _pool_start
+    global _frame_time
+    global _last_tick
+    global _redraw_all
+
+    with _condition:
+        if _thread_stop_signal:
+            _thread_stop_signal.set()
+            _thread_stop_signal = None
+
+        _queue_read.clear()
+        _queue_entries.clear()
+        _requests.clear()
+        _names.clear()
+        _workers.clear()
+        _busy_time = 0.0
+        _pool_start = None
+        _condition.notify_all()
+
+    _frame_time = 0.0
+    _last_tick = None
+    _redraw_due.clear()
+    _redraw_all = False
+    for key in _emplace_stats:
+        _emplace_stats[key] = type(_emplace_stats[key])()
+
+    while not _queue_emplace.empty():
+        try:
+            targets, data = _queue_emplace.get(block=False)
+        except:
+            break
+
+        _release(data)
+
+    processes.shutdown()
+
+    _pending = 0
+
+    if bpy.app.timers.is_registered(_emplace_timer):
+        bpy.app.timers.unregister(_emplace_timer)
+
+
+def stats() -> dict:
+    '''Return queue depths, read thread utilization since the pool started
+    and emplace steps on the main thread.
+    '''
+    ticks = _emplace_stats['ticks']
+    budget, _ = _emplace_budget()
+
+    with _condition:
+        workers = len(_workers)
+        uptime = time() - _pool_start if _pool_start else 0.0
+        utilization = 0.0
+        if workers and uptime:
+            utilization = min(_busy_time / (workers * uptime), 1.0)
+
+        return {
+            'pending': _pending,
+            'read_queue': len(_queue_entries),
+            'waiting_previews': len(_names),
+            'emplace_queue': _queue_emplace.qsize(),
+            'workers': workers,
+            'busy_workers': _busy,
+            'utilization': utilization,
+            'emplace_ticks': ticks,
+            'emplace_items': _emplace_stats['items'],
+            'emplace_items_per_tick': _emplace_stats['items'] / ticks if ticks else 0.0,
+            'emplace_bytes': _emplace_stats['bytes'],
+            'emplace_time': _emplace_stats['time'],
+            'emplace_max_tick_time': _emplace_stats['max_tick_time'],
+            'emplace_budget': budget,
+            'frame_time': _frame_time,
+        }
@@ -1,13 +1,16 @@
-import bpy
 import io
 import sys
+import mmap
+import struct
 import site
 import subprocess
 import importlib.util
 from pathlib import Path
+from threading import Lock
 from zlib import decompress
 from array import array
 from .formats import test_formats, BIP_FORMATS, PIL_FORMATS, MAGIC_LENGTH
+from . import batch
 from . import settings
 
 USER_SITE = site.getusersitepackages()
@@ -16,6 +19,8 @@ if USER_SITE not in sys.path:
     sys.path.append(USER_SITE)
 
 Image = None
+_pillow_lock = Lock()
+_pillow_tried = False
 
 
 def _import_pillow():
@@ -27,16 +32,18 @@ def _import_pillow():
     except:
         pass
     else:
-        test_formats()
-
-
-_import_pillow()
+        test_formats(settings.FORMATS_CACHE_FILE)
 
 
 def support_pillow() -> bool:
-    '''Check whether Pillow is installed.'''
-    if not Image and 'PIL' in sys.modules:
-        _import_pillow()
+    '''Check whether Pillow is installed, import it on the first call.'''
+    global _pillow_tried
+
+    if not _pillow_tried or (not Image and 'PIL' in sys.modules):
+        with _pillow_lock:
+            if not _pillow_tried or (not Image and 'PIL' in sys.modules):
+                _import_pillow()
+                _pillow_tried = True
 
     return bool(Image)
 
@@ -46,6 +53,7 @@ def install_pillow() -> bool:
     if 'python' in Path(sys.executable).stem.lower():
         exe = sys.executable
     else:
+        import bpy
         exe = bpy.app.binary_path_python
 
     args = [exe, '-m', 'ensurepip', '--user', '--upgrade', '--default-pip']
@@ -76,7 +84,7 @@ def can_load(filepath: str) -> bool:
         with open(filepath, 'rb') as file:
             magic = file.read(MAGIC_LENGTH)
 
-        # We support BIP (currently only BIP2).
+        # We support BIP (BIP2 and raw BIPR).
         for spec in BIP_FORMATS.values():
             if magic.startswith(spec.magic):
                 return True
@@ -98,7 +106,7 @@ def can_load(filepath: str) -> bool:
         if not ext:
             return False
 
-        # We support BIP (currently only BIP2).
+        # We support BIP (BIP2 and raw BIPR).
         for spec in BIP_FORMATS.values():
             if ext in spec.exts:
                 return True
@@ -134,23 +142,32 @@ def load_file(filepath: str, max_size: tuple) -> dict:
     with open(filepath, 'rb') as bip:
         magic = bip.read(MAGIC_LENGTH)
 
+        if magic.startswith(BIP_FORMATS['BIPR'].magic):
+            return _load_raw(bip, max_size)
+
         if magic.startswith(BIP_FORMATS['BIP2'].magic):
             bip.seek(len(BIP_FORMATS['BIP2'].magic), io.SEEK_SET)
 
             count = int.from_bytes(bip.read(1), 'big')
             assert count > 0, 'the file contains no images'
 
-            icon_size = [int.from_bytes(bip.read(2), 'big') for _ in range(2)]
-            icon_length = int.from_bytes(bip.read(4), 'big')
-            bip.seek(8 * (count - 2), io.SEEK_CUR)
-            image_size = [int.from_bytes(bip.read(2), 'big') for _ in range(2)]
-            image_length = int.from_bytes(bip.read(4), 'big')
+            headers = []
+            offset = len(BIP_FORMATS['BIP2'].magic) + 1 + 8 * count
+            for _ in range(count):
+                size = [int.from_bytes(bip.read(2), 'big') for _ in range(2)]
+                length = int.from_bytes(bip.read(4), 'big')
+                headers.append((size, offset, length))
+                offset += length
+
+            icon_size, icon_offset, icon_length = headers[0]
+            image_size, image_offset, image_length = _pick_level(headers[1:] or headers, max_size, support_pillow())
 
+            bip.seek(icon_offset, io.SEEK_SET)
             icon_content = decompress(bip.read(icon_length))
-            bip.seek(-image_length, io.SEEK_END)
+            bip.seek(image_offset, io.SEEK_SET)
             image_content = decompress(bip.read(image_length))
 
-            if support_pillow() and _should_resize(image_size, max_size):
+            if _should_resize(image_size, max_size) and support_pillow():
                 image = Image.frombytes('RGBa', image_size, image_content)
                 image = _resize_image(image, max_size)
                 image_size = image.size
@@ -175,6 +192,9 @@ def load_file(filepath: str, max_size: tuple) -> dict:
 
     if support_pillow():
         with Image.open(filepath) as image:
+            if batch.support_numpy():
+                return batch.convert([image.convert('RGBA')], max_size)[0]
+
             image = image.transpose(Image.FLIP_TOP_BOTTOM)
             image = image.convert('RGBA').convert('RGBa')
 
@@ -209,6 +229,118 @@ def load_file(filepath: str, max_size: tuple) -> dict:
     raise ValueError('input is not a supported file format')
 
 
+def is_bip(filepath: str) -> bool:
+    '''Check by extension whether a file is BIP, which loads without Pillow.'''
+    ext = Path(filepath).suffix.lower()
+    return any(ext in spec.exts for spec in BIP_FORMATS.values())
+
+
+def is_raw(filepath: str) -> bool:
+    '''Check by extension whether a file is raw BIP, which maps faster than
+    it loads from any cache or decode process.
+    '''
+    return Path(filepath).suffix.lower() in BIP_FORMATS['BIPR'].exts
+
+
+def _load_raw(file, max_size: tuple) -> dict:
+    '''Map raw BIP image preview data, see load_file.
+
+    The layout is like BIP2 with uncompressed payloads, each starting at a
+    multiple of 4 bytes. The pixels are memoryviews of the mapped file
+    unless the image has to be resized, call the release function of the
+    returned dictionary when they are no longer used.
+    '''
+    mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        count = mapped[len(BIP_FORMATS['BIPR'].magic)]
+        assert count > 0, 'the file contains no images'
+
+        offset = len(BIP_FORMATS['BIPR'].magic) + 1
+        values = struct.unpack_from('>' + 'HHI' * count, mapped, offset)
+        offset += 8 * count
+
+        headers = []
+        for index in range(0, len(values), 3):
+            width, height, length = values[index:index + 3]
+            assert length == 4 * width * height, 'unexpected amount of pixels'
+            offset += -offset % 4
+            headers.append(((width, height), offset, length))
+            offset += length
+
+        assert offset <= len(mapped), 'the file is truncated'
+    except (IndexError, struct.error, AssertionError):
+        mapped.close()
+        raise
+
+    icon_size, icon_offset, icon_length = headers[0]
+    image_size, image_offset, image_length = _pick_level(headers[1:] or headers, max_size, support_pillow())
+
+    view = memoryview(mapped)
+    icon_pixels = view[icon_offset:icon_offset + icon_length].cast('i')
+    image_pixels = view[image_offset:image_offset + image_length].cast('i')
+
+    if _should_resize(image_size, max_size) and support_pillow():
+        image = Image.frombytes('RGBa', image_size, image_pixels)
+        image = _resize_image(image, max_size)
+        image_pixels.release()
+        image_size = image.size
+        image_pixels = array('i', image.tobytes())
+
+    def release():
+        icon_pixels.release()
+        if isinstance(image_pixels, memoryview):
+            image_pixels.release()
+        view.release()
+        mapped.close()
+
+    return {
+        'icon_size': icon_size,
+        'icon_pixels': icon_pixels,
+        'image_size': image_size,
+        'image_pixels': image_pixels,
+        'release': release,
+    }
+
+
+def _pick_level(levels: list, max_size: tuple, can_resize: bool = True) -> tuple:
+    '''Return the (size, offset, length) level closest to maximum.
+
+    That is the smallest level at least as large as maximum, which is then
+    scaled down, or the largest one if none is. If it can't be resized, it
+    is the largest level that fits inside maximum, or the smallest one if
+    none fits.
+    '''
+    def area(level):
+        return level[0][0] * level[0][1]
+
+    if not can_resize:
+        fitting = [level for level in levels if not _should_resize(level[0], max_size)]
+        if fitting:
+            return max(fitting, key=area)
+
+        return min(levels, key=area)
+
+    covering = [level for level in levels if _covers(level[0], max_size)]
+    if covering:
+        return min(covering, key=area)
+
+    return max(levels, key=area)
+
+
+def _covers(size: tuple, max_size: tuple) -> bool:
+    '''Check whether size reaches maximum, so fitting it inside maximum
+    does not scale it up.
+    '''
+    if max_size[0] and size[0] >= max_size[0]:
+        return True
+
+    if max_size[1] and size[1] >= max_size[1]:
+        return True
+
+    return False
+
+
 def _should_resize(size: tuple, max_size: tuple) -> bool:
     '''Check whether width or height is greater than maximum.'''
     if max_size[0] and size[0] > max_size[0]:
@@ -231,9 +363,22 @@ def _resize_image(image: 'Image.Image', max_size: tuple) -> 'Image.Image':
     return image.resize(size=size)
 
 
-def tag_redraw():
-    '''Redraw every region in Blender.'''
+def tag_redraw(regions: set = None):
+    '''Redraw regions in Blender, every region if none are given.
+
+    Args:
+        regions: Pairs of area type and region type, a region type of
+            None stands for every region of such areas.
+    '''
+    import bpy
+
     for window in bpy.context.window_manager.windows:
         for area in window.screen.areas:
+            if regions is not None and (area.type, None) not in regions:
+                for region in area.regions:
+                    if (area.type, region.type) in regions:
+                        region.tag_redraw()
+                continue
+
             for region in area.regions:
                 region.tag_redraw()